@@ -0,0 +1,94 @@
+"""
+access token size and parse time of full and compact claims profiles
+
+parse is what a validator does on a token cache miss:
+signature check, json decode and normalize_claims
+
+run from project root:
+    python -m benchmarks.claims_profiles [--seconds 2] [--algorithm RS256] [--json]
+"""
+
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+
+from benchmarks.jwt_algorithms import (
+    KEY_FACTORIES,
+    access_token_payload,
+    ops_per_second,
+)
+from src.modules.reg_module.jwt_module.claims import compact_claims, normalize_claims
+from src.modules.reg_module.jwt_module.key_manager import KeyManager
+
+TOKEN_TYPE_FIELD = "token_type"
+
+
+def profiles() -> dict[str, dict]:
+    full = access_token_payload()
+    return {
+        "full": full,
+        "compact": compact_claims(full, TOKEN_TYPE_FIELD),
+        "compact, no email": compact_claims(
+            full, TOKEN_TYPE_FIELD, include_email=False
+        ),
+    }
+
+
+def bench(algorithm: str, seconds: float) -> list[dict]:
+    with tempfile.TemporaryDirectory() as keys_dir:
+        private_key = KEY_FACTORIES[algorithm]()
+        Path(keys_dir, "bench-private.pem").write_bytes(
+            private_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+        manager = KeyManager(keys_dir=Path(keys_dir), active_kid="bench")
+
+    results = []
+    for name, payload in profiles().items():
+        token = manager.sign(payload)
+
+        def parse(token=token):
+            return normalize_claims(manager.verify(token), TOKEN_TYPE_FIELD)
+
+        results.append(
+            {
+                "profile": name,
+                "token_bytes": len(token),
+                "parse_ops": ops_per_second(parse, seconds),
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--algorithm", choices=KEY_FACTORIES, default="RS256")
+    parser.add_argument("--json", action="store_true", help="print json results")
+    args = parser.parse_args()
+
+    results = bench(args.algorithm, args.seconds)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    base = results[0]
+    print(
+        f"{'profile':<20}{'token bytes':>12}{'size':>8}{'parse ops/s':>14}{'time':>8}"
+    )
+    for result in results:
+        size_change = (result["token_bytes"] / base["token_bytes"] - 1) * 100
+        parse_change = (base["parse_ops"] / result["parse_ops"] - 1) * 100
+        print(
+            f"{result['profile']:<20}{result['token_bytes']:>12}{size_change:>+7.0f}%"
+            f"{result['parse_ops']:>14.0f}{parse_change:>+7.0f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
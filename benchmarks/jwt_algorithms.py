@@ -0,0 +1,92 @@
+"""
+sign/verify throughput of RS256, ES256 and EdDSA on the access token payload
+
+run from project root:
+    python -m benchmarks.jwt_algorithms [--seconds 2] [--json]
+"""
+
+import argparse
+import datetime
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from src.modules.reg_module.jwt_module.key_manager import KeyManager
+
+KEY_FACTORIES = {
+    "RS256": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "ES256": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "EdDSA": ed25519.Ed25519PrivateKey.generate,
+}
+
+
+def access_token_payload() -> dict:
+    # same claims as creator.create_access_token
+    now = datetime.datetime.now(datetime.UTC)
+    return {
+        "sub": "123456",
+        "email": "someone@example.com",
+        "role": "user",
+        "scope": "profile:read profile:write quota:read",
+        "exp": now + datetime.timedelta(minutes=3600),
+        "iat": now,
+        "token_type": "access_token",
+    }
+
+
+def ops_per_second(func, seconds: float) -> float:
+    count = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for _ in range(20):
+            func()
+        count += 20
+    return count / (time.perf_counter() - start)
+
+
+def bench(algorithm: str, seconds: float) -> dict:
+    with tempfile.TemporaryDirectory() as keys_dir:
+        private_key = KEY_FACTORIES[algorithm]()
+        Path(keys_dir, "bench-private.pem").write_bytes(
+            private_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+        manager = KeyManager(keys_dir=Path(keys_dir), active_kid="bench")
+    payload = access_token_payload()
+    token = manager.sign(payload)
+    return {
+        "algorithm": manager.active_key.algorithm,
+        "token_bytes": len(token),
+        "sign_ops": ops_per_second(lambda: manager.sign(payload), seconds),
+        "verify_ops": ops_per_second(lambda: manager.verify(token), seconds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--json", action="store_true", help="print json results")
+    args = parser.parse_args()
+
+    results = [bench(algorithm, args.seconds) for algorithm in KEY_FACTORIES]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'algorithm':<10}{'token bytes':>12}{'sign ops/s':>14}{'verify ops/s':>14}")
+    for result in results:
+        print(
+            f"{result['algorithm']:<10}{result['token_bytes']:>12}"
+            f"{result['sign_ops']:>14.0f}{result['verify_ops']:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
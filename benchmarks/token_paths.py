@@ -0,0 +1,229 @@
+"""
+microbenchmarks of token creation and validation paths, compared to a
+stored baseline, exits with code 1 when a case is slower than baseline
+by more than --threshold percent
+
+no external services are used: a fresh RSA key is put into a temp
+JWT_KEYS_DIR, guest quota and role catalog are in-memory stand-ins and
+db/smtp settings are placeholders (engines never connect)
+
+run from project root:
+    python -m benchmarks.token_paths [--threshold 25] [--rounds 7]
+    python -m benchmarks.token_paths --save-baseline   # after intended changes
+
+baseline depends on the machine, refresh it when the benchmark host changes
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+BASELINE_PATH = Path(__file__).with_name("token_paths_baseline.json")
+PLACEHOLDER_ENV = {
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_USERNAME": "bench",
+    "DATABASE_PASSWORD": "bench",
+    "DATABASE_NAME": "bench",
+    "SMTP_SERVER": "localhost",
+    "SMTP_PORT": "25",
+    "SMTP_USER": "bench@example.com",
+    "SMTP_PASSWORD": "",
+    "VERIFICATION_CODE_SECRET": "bench",
+}
+# stand-in of roles table for role catalog
+BENCH_ROLES = {
+    1: ("user", ["profile:read", "profile:write", "quota:read"]),
+    2: ("guest", ["quota:read"]),
+}
+
+
+class MemoryQuotaStore:
+    """
+    stand-in of QuotaStore for validation of guest tokens
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._used: dict[int, int] = {}
+
+    async def peek(self, user_id: int) -> int:
+        return self._used.get(user_id, 0)
+
+
+def setup_environment(keys_dir: str) -> None:
+    """
+    must run before src is imported, settings are read on import
+    """
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    Path(keys_dir, "bench-private.pem").write_bytes(
+        private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    os.environ["JWT_KEYS_DIR"] = keys_dir
+    os.environ["JWT_ACTIVE_KID"] = "bench"
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+
+
+def build_cases() -> dict:
+    """
+    :return: case name -> (callable, is_async)
+    """
+    from src.database.models import User
+    from src.modules.grpc_token_validator.grpc_token_validator import token_claims
+    from src.modules.reg_module.jwt_module import depends
+    from src.modules.reg_module.jwt_module.creator import (
+        create_access_token,
+        create_refresh_token,
+    )
+    from src.services.role_catalog import role_catalog
+
+    role_catalog.replace(BENCH_ROLES)
+    depends.quota_store = MemoryQuotaStore(limit=20)
+    user = User(id=123456, email="someone@example.com")
+    guest = User(id=654321, email=None)
+    user_token = create_access_token(user=user, role="user")
+    guest_token = create_access_token(user=guest, role="guest")
+    user_payload = depends.decode_access_token(user_token)
+    guest_payload = depends.decode_access_token(guest_token)
+
+    async def get_user_cold_cache():
+        depends.token_cache.clear()
+        await depends.get_user_from_token(user_token)
+
+    return {
+        "create_access_token": (lambda: create_access_token(user, "user"), False),
+        "create_refresh_token": (lambda: create_refresh_token(user.id), False),
+        "get_user_from_token[user]": (
+            lambda: depends.get_user_from_token(user_token),
+            True,
+        ),
+        "get_user_from_token[guest]": (
+            lambda: depends.get_user_from_token(guest_token),
+            True,
+        ),
+        "get_user_from_token[user,no_cache]": (get_user_cold_cache, True),
+        "validate_access_token_payload[user]": (
+            lambda: depends.validate_access_token_payload(user_payload),
+            True,
+        ),
+        "validate_access_token_payload[guest]": (
+            lambda: depends.validate_access_token_payload(guest_payload),
+            True,
+        ),
+        "check_token_claims": (lambda: token_claims(user_payload), False),
+    }
+
+
+def _time_calls(func, is_async: bool, number: int) -> float:
+    if not is_async:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - start
+
+    async def run() -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return time.perf_counter() - start
+
+    return asyncio.run(run())
+
+
+def _time_calls_without_gc(func, is_async: bool, number: int) -> float:
+    # same as timeit, collector pauses are noise here
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _time_calls(func, is_async, number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def measure(func, is_async: bool, rounds: int, round_seconds: float) -> float:
+    """
+    :return: best microseconds per call over rounds
+    """
+    # calibrate calls per round
+    number = 1
+    while (elapsed := _time_calls(func, is_async, number)) < round_seconds / 10:
+        number *= 10
+    number = max(1, int(number * round_seconds / elapsed))
+    return min(
+        _time_calls_without_gc(func, is_async, number) / number * 1_000_000
+        for _ in range(rounds)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--round-seconds", type=float, default=0.2)
+    parser.add_argument(
+        "--threshold", type=float, default=25.0, help="allowed slowdown, percent"
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print json results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as keys_dir:
+        setup_environment(keys_dir)
+        cases = build_cases()
+
+        def run_case(name: str, rounds: int) -> float:
+            func, is_async = cases[name]
+            return round(measure(func, is_async, rounds, args.round_seconds), 3)
+
+        results = {name: run_case(name, args.rounds) for name in cases}
+        if args.save_baseline:
+            args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+            print(f"baseline saved to {args.baseline}")
+            return
+        if args.json:
+            print(json.dumps(results, indent=2))
+            return
+
+        baseline = (
+            json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        )
+        regressions = []
+        print(f"{'case':<40}{'us/call':>10}{'baseline':>10}{'change':>9}")
+        for name, us_per_call in results.items():
+            base = baseline.get(name)
+            if base and (us_per_call - base) / base * 100 > args.threshold:
+                # confirm with a longer run, single slow runs are mostly noise
+                us_per_call = min(us_per_call, run_case(name, args.rounds * 2))
+            line = f"{name:<40}{us_per_call:>10.2f}"
+            if base:
+                change = (us_per_call - base) / base * 100
+                line += f"{base:>10.2f}{change:>+8.1f}%"
+                if change > args.threshold:
+                    regressions.append(name)
+                    line += "  REGRESSION"
+            print(line)
+    if regressions:
+        print(
+            f"{len(regressions)} case(s) slower than baseline by more than "
+            f"{args.threshold}%: {', '.join(regressions)}"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+standalone grpc token validator, GRPC_WORKERS processes listen on one port
+(SO_REUSEPORT), so signature checks use every cpu instead of one GIL
+
+run the http app with GRPC_IN_PROCESS=false and:
+    python grpc_main.py
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+
+from src.core.config import load_config
+
+config = load_config()
+logger = logging.getLogger("grpc_main")
+
+# seconds before a crashed worker is started again
+RESTART_DELAY = 1.0
+
+
+def _setup_logging() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(process)d - %(name)s - %(message)s",
+    )
+
+
+async def _serve() -> None:
+    # imported in worker only, grpc must not be initialized before spawn
+    from src.core.pubsub import run_pubsub_listener
+    from src.core.redis_initializer import close_async_redis, init_async_redis
+    from src.core.startup import startup_report
+    from src.database import close_engines
+    from src.modules.grpc_token_validator.grpc_token_validator import (
+        start_grpc,
+        stop_grpc,
+    )
+    from src.modules.quota.quota_store import quota_store, run_quota_flusher
+    from src.modules.reg_module.jwt_module.key_manager import watch_keys
+    from src.services.role_catalog import role_catalog
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    with startup_report.phase("redis_ping"):
+        await init_async_redis()
+    # compact tokens and guest rows written by quota flush use role ids
+    with startup_report.phase("role_catalog"):
+        await role_catalog.load()
+    with startup_report.phase("grpc_bind"):
+        server = await start_grpc()
+    tasks = [
+        asyncio.create_task(watch_keys(config.jwt.keys_reload_interval_seconds)),
+        asyncio.create_task(run_pubsub_listener()),
+        # ConsumeQuota changes counters, any process may write them back
+        asyncio.create_task(
+            run_quota_flusher(
+                config.quota.flush_interval_seconds, config.quota.flush_batch_size
+            )
+        ),
+    ]
+    startup_report.log(logger)
+    await stop.wait()
+    for task in tasks:
+        task.cancel()
+    await stop_grpc(server)
+    await quota_store.flush(config.quota.flush_batch_size)
+    await close_async_redis()
+    await close_engines()
+
+
+def run_worker() -> None:
+    _setup_logging()
+    asyncio.run(_serve())
+
+
+def _start_worker(context) -> multiprocessing.Process:
+    process = context.Process(target=run_worker, name="grpc-worker")
+    process.start()
+    logger.info(f"gRPC worker {process.pid} started")
+    return process
+
+
+def _start_metrics_server() -> None:
+    from prometheus_client import start_http_server
+
+    from src.core.metrics import metrics_registry
+
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        logger.warning("Set PROMETHEUS_MULTIPROC_DIR to export metrics of workers")
+    start_http_server(config.grpc.GRPC_METRICS_PORT, registry=metrics_registry())
+
+
+def _mark_process_dead(pid: int) -> None:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
+
+
+def main() -> None:
+    _setup_logging()
+    workers = config.grpc.GRPC_WORKERS or os.cpu_count() or 1
+    # spawn, grpc core state is not fork safe
+    context = multiprocessing.get_context("spawn")
+    if config.grpc.GRPC_METRICS_PORT:
+        _start_metrics_server()
+
+    stopping = False
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    processes = [_start_worker(context) for _ in range(workers)]
+    logger.info(
+        f"{workers} gRPC workers on {config.grpc.GRPC_HOST}:{config.grpc.GRPC_PORT}"
+    )
+    while not stopping:
+        multiprocessing.connection.wait(
+            [process.sentinel for process in processes], timeout=1
+        )
+        if stopping:
+            break
+        for i, process in enumerate(processes):
+            if not process.is_alive():
+                logger.error(
+                    f"gRPC worker {process.pid} exited with {process.exitcode}"
+                )
+                _mark_process_dead(process.pid)
+                time.sleep(RESTART_DELAY)
+                processes[i] = _start_worker(context)
+
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+        _mark_process_dead(process.pid)
+    logger.warning("gRPC workers stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+end-to-end load test of login, guest and token validation flows
+
+starts an smtp sink, a celery worker (threads pool) and the app (uvicorn,
+with its grpc server) in this process against postgres and redis from .env,
+then runs the scenarios one after another:
+    login    POST /auth/auth, code from smtp sink, POST /auth/verify_code
+    guest    GET /auth/verify_guest bursts
+    refresh  GET /auth/refresh_token, rotated cookie is used for the next call
+    grpc     CheckToken with tokens issued above, sustained for --seconds
+
+every request gets its own X-Forwarded-For address, so per ip rate limits
+behave like traffic of many clients
+
+run from project root:
+    python -m loadtests.run [--users 20] [--logins 200] [--guests 1000]
+        [--refreshes 500] [--seconds 10] [--out loadtests/results]
+        [--compare loadtests/results/<previous>.json]
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from loadtests.smtp_sink import SMTPSink
+
+ROOT_PATH = "/auth"
+REFRESH_COOKIE = "refresh_token"
+
+
+class Recorder:
+    """
+    latencies and errors of every step of one scenario
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+        self.flows = 0
+        self.started = 0.0
+        self.finished = 0.0
+
+    def observe(self, step: str, seconds: float) -> None:
+        self.latencies[step].append(seconds)
+
+    def error(self, step: str, reason: str) -> None:
+        self.errors[f"{step}: {reason}"] += 1
+
+    def summary(self) -> dict:
+        duration = self.finished - self.started
+        return {
+            "flows": self.flows,
+            "errors": sum(self.errors.values()),
+            "error_reasons": dict(self.errors.most_common(10)),
+            "duration_seconds": round(duration, 3),
+            "flows_per_second": round(self.flows / duration, 1) if duration else 0.0,
+            "steps": {
+                step: latency_stats(samples, duration)
+                for step, samples in self.latencies.items()
+            },
+        }
+
+
+def latency_stats(samples: list[float], duration: float) -> dict:
+    samples = sorted(seconds * 1000 for seconds in samples)
+    if len(samples) >= 2:
+        quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+        p50, p95, p99 = quantiles[49], quantiles[94], quantiles[98]
+    else:
+        p50 = p95 = p99 = samples[0] if samples else 0.0
+    return {
+        "count": len(samples),
+        "per_second": round(len(samples) / duration, 1) if duration else 0.0,
+        "p50_ms": round(p50, 2),
+        "p95_ms": round(p95, 2),
+        "p99_ms": round(p99, 2),
+        "max_ms": round(samples[-1], 2) if samples else 0.0,
+    }
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, sink: SMTPSink, http, grpc_stub):
+        self.args = args
+        self.sink = sink
+        self.http = http
+        self.grpc_stub = grpc_stub
+        self.sessions: list[dict] = []
+        self.guest_tokens: list[str] = []
+        self._idle_sessions: asyncio.Queue[dict] = asyncio.Queue()
+        self._ips = itertools.count(1)
+        self._run_id = int(time.time())
+
+    def _client_ip(self) -> str:
+        n = next(self._ips)
+        return f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+    async def _request(
+        self, recorder: Recorder, step: str, method: str, path: str, **kwargs
+    ):
+        headers = {"X-Forwarded-For": self._client_ip(), **kwargs.pop("headers", {})}
+        start = time.perf_counter()
+        response = await self.http.request(
+            method, ROOT_PATH + path, headers=headers, **kwargs
+        )
+        recorder.observe(step, time.perf_counter() - start)
+        if response.status_code != 200:
+            recorder.error(step, str(response.status_code))
+            return None
+        return response
+
+    async def _run(self, recorder: Recorder, flow, iterations: int) -> None:
+        """
+        run flow iterations times on --users concurrent virtual users
+        """
+        remaining = itertools.count()
+
+        async def user() -> None:
+            while next(remaining) < iterations:
+                try:
+                    if await flow(recorder):
+                        recorder.flows += 1
+                except Exception as e:
+                    recorder.error("flow", type(e).__name__)
+
+        recorder.started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(self.args.users)))
+        recorder.finished = time.perf_counter()
+
+    async def _login(self, recorder: Recorder) -> bool:
+        email = f"load-{self._run_id}-{next(self._ips)}@example.com"
+        start = time.perf_counter()
+        if not await self._request(
+            recorder, "auth", "POST", "/auth/auth", json={"email": email}
+        ):
+            return False
+        try:
+            code = await self.sink.wait_for_code(email, self.args.code_timeout)
+        except TimeoutError:
+            recorder.error("email", "timeout")
+            return False
+        recorder.observe("email", time.perf_counter() - start)
+        response = await self._request(
+            recorder,
+            "verify_code",
+            "POST",
+            "/auth/verify_code",
+            json={"email": email, "code": code},
+        )
+        if not response:
+            return False
+        recorder.observe("flow", time.perf_counter() - start)
+        self.sessions.append(
+            {
+                "access_token": response.json()["access_token"],
+                "refresh_token": response.cookies[REFRESH_COOKIE],
+            }
+        )
+        return True
+
+    async def _guest(self, recorder: Recorder) -> bool:
+        response = await self._request(
+            recorder, "verify_guest", "GET", "/auth/verify_guest"
+        )
+        if not response:
+            return False
+        self.guest_tokens.append(response.json()["access_token"])
+        return True
+
+    async def _refresh(self, recorder: Recorder) -> bool:
+        # a refresh token is single use, session is never refreshed concurrently
+        session = await self._idle_sessions.get()
+        try:
+            response = await self._request(
+                recorder,
+                "refresh_token",
+                "GET",
+                "/auth/refresh_token",
+                headers={"Cookie": f"{REFRESH_COOKIE}={session['refresh_token']}"},
+            )
+            if not response:
+                return False
+            session["access_token"] = response.json()["access_token"]
+            if rotated := response.cookies.get(REFRESH_COOKIE):
+                session["refresh_token"] = rotated
+            return True
+        finally:
+            self._idle_sessions.put_nowait(session)
+
+    async def _grpc(self, recorder: Recorder) -> None:
+        from src.modules.grpc_token_validator import auth_service_pb2
+
+        tokens = [s["access_token"] for s in self.sessions] + self.guest_tokens
+        deadline = time.perf_counter() + self.args.seconds
+        tokens_cycle = itertools.cycle(tokens)
+
+        async def user() -> None:
+            while time.perf_counter() < deadline:
+                request = auth_service_pb2.TokenRequest(token=next(tokens_cycle))
+                start = time.perf_counter()
+                try:
+                    response = await self.grpc_stub.CheckToken(request, timeout=5)
+                except Exception as e:
+                    recorder.error("CheckToken", type(e).__name__)
+                    continue
+                recorder.observe("CheckToken", time.perf_counter() - start)
+                recorder.flows += 1
+                if not response.valid:
+                    recorder.error("CheckToken", response.error)
+
+        recorder.started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(self.args.users)))
+        recorder.finished = time.perf_counter()
+
+    async def run(self) -> dict:
+        results = {}
+        login = Recorder("login")
+        await self._run(login, self._login, self.args.logins)
+        results["login"] = login.summary()
+
+        guest = Recorder("guest")
+        await self._run(guest, self._guest, self.args.guests)
+        results["guest"] = guest.summary()
+
+        if self.sessions:
+            for session in self.sessions:
+                self._idle_sessions.put_nowait(session)
+            refresh = Recorder("refresh")
+            await self._run(refresh, self._refresh, self.args.refreshes)
+            results["refresh"] = refresh.summary()
+
+        if self.sessions or self.guest_tokens:
+            grpc_check = Recorder("grpc")
+            await self._grpc(grpc_check)
+            results["grpc"] = grpc_check.summary()
+        return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _start_app(host: str, port: int):
+    import uvicorn
+
+    from main import app
+
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app,
+            host=host,
+            port=port,
+            proxy_headers=True,
+            forwarded_allow_ips="*",
+            log_level="warning",
+        )
+    )
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("App failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def _load(args: argparse.Namespace, sink: SMTPSink) -> dict:
+    import grpc
+    import httpx
+
+    from src.core.config import load_config
+    from src.modules.grpc_token_validator import auth_service_pb2_grpc
+
+    grpc_port = load_config().grpc.GRPC_PORT
+    async with (
+        httpx.AsyncClient(
+            base_url=f"http://{args.host}:{args.port}",
+            limits=httpx.Limits(max_connections=args.users),
+            timeout=30,
+        ) as http,
+        grpc.aio.insecure_channel(f"127.0.0.1:{grpc_port}") as channel,
+    ):
+        stub = auth_service_pb2_grpc.AuthServiceStub(channel)
+        return await LoadTest(args, sink, http, stub).run()
+
+
+def print_summary(results: dict, previous: dict | None) -> None:
+    for scenario, summary in results["scenarios"].items():
+        print(
+            f"{scenario}: {summary['flows']} ok, {summary['errors']} errors, "
+            f"{summary['flows_per_second']}/s"
+        )
+        for step, stats in summary["steps"].items():
+            line = (
+                f"  {step:<14} {stats['per_second']:>9}/s  p50 {stats['p50_ms']:>8}ms"
+                f"  p95 {stats['p95_ms']:>8}ms  p99 {stats['p99_ms']:>8}ms"
+            )
+            old = (
+                (previous or {})
+                .get("scenarios", {})
+                .get(scenario, {})
+                .get("steps", {})
+                .get(step)
+            )
+            if old and old["p99_ms"]:
+                change = (stats["p99_ms"] - old["p99_ms"]) / old["p99_ms"] * 100
+                line += f"  (p99 {change:+.0f}% vs {previous['commit']})"
+            print(line)
+        for reason, count in summary["error_reasons"].items():
+            print(f"  ! {reason}: {count}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20, help="concurrent clients")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--guests", type=int, default=1000)
+    parser.add_argument("--refreshes", type=int, default=500)
+    parser.add_argument(
+        "--seconds", type=float, default=10, help="grpc CheckToken duration"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--worker-concurrency", type=int, default=4)
+    parser.add_argument("--code-timeout", type=float, default=30)
+    parser.add_argument("--out", type=Path, default=Path("loadtests/results"))
+    parser.add_argument("--compare", type=Path, help="previous results json")
+    args = parser.parse_args()
+
+    sink = SMTPSink()
+    sink.start()
+    # must be set before src is imported, config is read on import
+    os.environ.update(
+        SMTP_SERVER=sink.host,
+        SMTP_PORT=str(sink.port),
+        SMTP_USER="loadtest@example.com",
+        SMTP_PASSWORD="",
+        SMTP_STARTTLS="false",
+    )
+    # api and worker run in this process, any key works for them
+    os.environ.setdefault("VERIFICATION_CODE_SECRET", "loadtest")
+    from celery.contrib.testing.worker import start_worker
+
+    from src.core.celery_config import celery
+
+    try:
+        server, thread = _start_app(args.host, args.port)
+        try:
+            with start_worker(
+                celery,
+                pool="threads",
+                concurrency=args.worker_concurrency,
+                perform_ping_check=False,
+                loglevel="WARNING",
+            ):
+                scenarios = asyncio.run(_load(args, sink))
+        finally:
+            server.should_exit = True
+            thread.join(timeout=30)
+    finally:
+        sink.stop()
+
+    results = {
+        "commit": _git_commit(),
+        "started_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        "args": {k: str(v) for k, v in vars(args).items()},
+        "scenarios": scenarios,
+    }
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+    print_summary(results, previous)
+    args.out.mkdir(parents=True, exist_ok=True)
+    path = args.out / f"{time.strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json"
+    path.write_text(json.dumps(results, indent=2))
+    print(f"results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+minimal smtp server capturing verification codes instead of delivering them,
+only what smtplib needs without STARTTLS and AUTH
+(run the worker with SMTP_STARTTLS=false and empty SMTP_PASSWORD)
+"""
+
+import asyncio
+import concurrent.futures
+import email
+import re
+import threading
+
+CODE_RE = re.compile(rb"\b(\d{6})\b")
+
+
+class SMTPSink:
+    """
+    smtp server running on its own event loop thread,
+    codes are handed to load test coroutines through futures
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.messages = 0
+        self._codes: dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._server: asyncio.Server | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="smtp-sink", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+        self._server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, self.host, self.port), self._loop
+        ).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+    async def _shutdown(self) -> None:
+        # pooled smtp sessions of the worker may still be open
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+
+    def _future(self, address: str) -> concurrent.futures.Future:
+        with self._lock:
+            return self._codes.setdefault(address.lower(), concurrent.futures.Future())
+
+    async def wait_for_code(self, address: str, timeout: float) -> str:
+        """
+        code of the next email sent to address
+        :raise: TimeoutError if nothing arrived in timeout seconds
+        """
+        future = self._future(address)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        finally:
+            with self._lock:
+                if self._codes.get(address.lower()) is future:
+                    del self._codes[address.lower()]
+
+    def _deliver(self, recipients: list[str], data: bytes) -> None:
+        self.messages += 1
+        message = email.message_from_bytes(data)
+        body = message.get_payload(decode=True) or b""
+        if not (match := CODE_RE.search(body)):
+            return
+        for address in recipients:
+            future = self._future(address)
+            if not future.done():
+                future.set_result(match.group(1).decode())
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._writers.add(writer)
+        writer.write(b"220 smtp-sink ESMTP\r\n")
+        recipients: list[str] = []
+        try:
+            while line := await reader.readline():
+                verb = line[:4].upper()
+                if verb in (b"EHLO", b"HELO", b"NOOP"):
+                    writer.write(b"250 OK\r\n")
+                elif verb in (b"MAIL", b"RSET"):
+                    recipients = []
+                    writer.write(b"250 OK\r\n")
+                elif verb == b"RCPT":
+                    address = line.split(b":", 1)[1].strip().strip(b"<>")
+                    recipients.append(address.decode())
+                    writer.write(b"250 OK\r\n")
+                elif verb == b"DATA":
+                    writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    await writer.drain()
+                    lines = []
+                    while (data_line := await reader.readline()) not in (
+                        b".\r\n",
+                        b"",
+                    ):
+                        # undo dot-stuffing
+                        lines.append(
+                            data_line[1:] if data_line[:2] == b".." else data_line
+                        )
+                    self._deliver(recipients, b"".join(lines))
+                    writer.write(b"250 OK\r\n")
+                elif verb == b"QUIT":
+                    writer.write(b"221 Bye\r\n")
+                    break
+                else:
+                    writer.write(b"502 Command not implemented\r\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
@@ -1,13 +1,27 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
-from src.core.redis_initializer import init_redis
-from src.database import init_models
-from src.modules.grpc_token_validator.grpc_token_validator import run_grpc
+from src.core.config import load_config
+from src.core.pubsub import run_pubsub_listener
+from src.core.redis_initializer import close_async_redis, init_async_redis
+from src.core.startup import startup_report
+from src.database import close_engines, init_models
+from src.modules.quota.quota_store import quota_store, run_quota_flusher
+from src.modules.reg_module.jwt_module.key_manager import watch_keys
+from src.modules.reg_module.jwt_module.revocation import (
+    revocation_store,
+    run_revocation_sync,
+)
 from src.routes import main_router
+from src.services.role_catalog import role_catalog
+from src.services.user_services import UserService
+
+config = load_config()
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -16,13 +30,60 @@ async def lifespan(app: FastAPI):
         level=logging.DEBUG,
         format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
     )
-    # starts grpc service
-    run_grpc()
-    # init redis
-    init_redis()
+    # init redis pool
+    with startup_report.phase("redis_ping"):
+        await init_async_redis()
     # init psql models
-    await init_models()
+    with startup_report.phase("init_models"):
+        changed_user_ids = await init_models()
+    if changed_user_ids:
+        # users deleted or changed by migration may still be cached
+        await UserService.invalidate_users(changed_user_ids)
+        logger.warning(f"Migrations removed or changed {len(changed_user_ids)} users")
+    with startup_report.phase("role_catalog"):
+        await role_catalog.load()
+    # bloom filter of revoked refresh tokens must be loaded before requests,
+    # startup fails if redis can't be scanned
+    with startup_report.phase("revocation_filter"):
+        await revocation_store.rebuild()
+    # starts grpc service on the app event loop (or run grpc_main.py)
+    grpc_server = None
+    if config.grpc.GRPC_IN_PROCESS:
+        # grpc is imported only by processes that serve it
+        from src.modules.grpc_token_validator.grpc_token_validator import (
+            start_grpc,
+            stop_grpc,
+        )
+
+        with startup_report.phase("grpc_bind"):
+            grpc_server = await start_grpc()
+    # pick up rotated jwt keys without restart
+    keys_watcher = asyncio.create_task(
+        watch_keys(config.jwt.keys_reload_interval_seconds)
+    )
+    # cache invalidations and other cross-process events
+    pubsub_listener = asyncio.create_task(run_pubsub_listener())
+    # periodic rebuild drops expired revocations
+    revocation_sync = asyncio.create_task(
+        run_revocation_sync(config.revocation.rebuild_interval_seconds)
+    )
+    # write-behind of guest quota counters to postgres
+    quota_flusher = asyncio.create_task(
+        run_quota_flusher(
+            config.quota.flush_interval_seconds, config.quota.flush_batch_size
+        )
+    )
+    startup_report.log(logger)
     yield
+    keys_watcher.cancel()
+    quota_flusher.cancel()
+    pubsub_listener.cancel()
+    revocation_sync.cancel()
+    if grpc_server is not None:
+        await stop_grpc(grpc_server)
+    await quota_store.flush(config.quota.flush_batch_size)
+    await close_async_redis()
+    await close_engines()
 
 
 app = FastAPI(
@@ -1,8 +1,26 @@
+import os
+import time
+
 from celery import Celery
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_shutdown,
+)
+from prometheus_client import multiprocess, start_http_server
+
+from src.core.metrics import CELERY_TASK_SECONDS, metrics_registry
+
+# port of worker /metrics, 0 disables it; with prefork pool set
+# PROMETHEUS_MULTIPROC_DIR so metrics of child processes are exported
+CELERY_METRICS_PORT = int(os.getenv("CELERY_METRICS_PORT", 0))
 
 celery = Celery(
     "tasks",
     broker="redis://localhost:6379/1",  # Tasks queue
+    # api only sends tasks by name (see producer.py), workers import them here
+    include=["src.modules.smtp_celery_sender.send_code_to_user"],
 )
 
 celery.conf.update(
@@ -10,3 +28,31 @@ celery.conf.update(
     accept_content=["json"],
     result_serializer="json",
 )
+
+# task id -> perf_counter at start, tasks of one process only
+_task_started: dict[str, float] = {}
+
+
+@task_prerun.connect
+def _start_task_timer(task_id: str, **kwargs) -> None:
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _observe_task_time(task_id: str, task, state: str | None = None, **kwargs) -> None:
+    if (started := _task_started.pop(task_id, None)) is not None:
+        CELERY_TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
+
+
+@worker_init.connect
+def _start_metrics_server(**kwargs) -> None:
+    if CELERY_METRICS_PORT:
+        start_http_server(CELERY_METRICS_PORT, registry=metrics_registry())
+
+
+@worker_process_shutdown.connect
+def _mark_metrics_process_dead(pid: int | None = None, **kwargs) -> None:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid or os.getpid())
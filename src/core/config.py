@@ -1,9 +1,13 @@
+import functools
 import os
 from pathlib import Path
+from typing import Literal
 
 from pydantic import BaseModel, field_validator
 from pydantic_settings import BaseSettings
 
+from src.core.startup import startup_report
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
@@ -12,12 +16,22 @@ class AuthJWT(BaseModel):
     base config for jwt information
     """
 
-    public_key_path: str
-    private_key_path: str
-    algorithm: str
+    # directory with <kid>-private.pem/<kid>-public.pem key pairs
+    keys_dir: str
+    # kid used to sign new tokens
+    active_kid: str
+    # how often keys_dir is checked for rotated keys
+    keys_reload_interval_seconds: int
     access_token_expire_minutes: int
     refresh_token_expire_days: int
     token_type_field: str
+    # claims of new access tokens, both profiles are accepted (jwt_module/claims.py)
+    claims_profile: Literal["full", "compact"]
+    # compact profile only, email is optional there
+    compact_claims_email: bool
+    # verified token cache (see jwt_module/token_cache.py)
+    token_cache_size: int
+    token_cache_negative_ttl_seconds: int
 
 
 class DBConfig(BaseModel):
@@ -26,20 +40,129 @@ class DBConfig(BaseModel):
     database_username: str
     database_password: str
     database_name: str
+    # optional read replica, full sqlalchemy url (postgresql+asyncpg://...)
+    database_replica_url: str | None = None
+    # connections kept open per process (per engine)
+    database_pool_size: int = 10
+    # extra connections opened under load above pool_size
+    database_max_overflow: int = 10
+    # seconds after which a connection is re-opened
+    database_pool_recycle: int = 1800
+    database_pool_pre_ping: bool = True
+    # asyncpg prepared statements cache per connection, 0 for pgbouncer
+    database_statement_cache_size: int = 100
+    database_echo: bool = False
 
 
 class SMTPConfig(BaseSettings):
     SMTP_SERVER: str
     SMTP_PORT: int
     SMTP_USER: str
+    # empty password skips AUTH (local relays and test sinks)
     SMTP_PASSWORD: str
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT: int = 10
+    # open sessions kept per worker process
+    SMTP_POOL_SIZE: int = 2
+    # idle sessions older than this are closed instead of reused
+    SMTP_POOL_IDLE_TIMEOUT: int = 60
+    # collect code emails and send them over one session per batch
+    SMTP_BATCH_ENABLED: bool = False
+    SMTP_BATCH_WINDOW_MS: int = 200
+    SMTP_BATCH_MAX_SIZE: int = 50
+
+
+class GRPCConfig(BaseSettings):
+    GRPC_HOST: str = "[::]"
+    GRPC_PORT: int = 50051
+    # max rpcs handled at once, extra calls are rejected with RESOURCE_EXHAUSTED
+    GRPC_MAX_CONCURRENT_RPCS: int = 1000
+    # run grpc server inside the http app, switch off when grpc_main.py is used
+    GRPC_IN_PROCESS: bool = True
+    # grpc_main.py processes sharing the port, 0 is one per cpu
+    GRPC_WORKERS: int = 0
+    # port of grpc_main.py /metrics, 0 disables it
+    GRPC_METRICS_PORT: int = 0
+
+
+class QuotaConfig(BaseModel):
+    """
+    guest free requests counters, see modules/quota
+    """
+
+    guest_requests_limit: int
+    # redis counter lifetime, reset on every consume
+    counter_ttl_seconds: int
+    # write-behind of counters to users.requests_count
+    flush_interval_seconds: int
+    flush_batch_size: int
+
+
+class UserCacheConfig(BaseModel):
+    """
+    read-through cache in front of UserService reads
+    """
+
+    local_size: int
+    # short, other processes' changes reach local cache via pub/sub anyway
+    local_ttl_seconds: int
+    redis_ttl_seconds: int
+
+
+class GuestConfig(BaseModel):
+    # issue guest tokens with reserved ids and no INSERT,
+    # row is written on first quota flush
+    lazy_rows: bool
+    # ids reserved from users sequence per db round trip
+    id_block_size: int
+
+
+class RateLimit(BaseModel):
+    limit: int
+    window_seconds: int
+
+
+class RateLimitConfig(BaseModel):
+    """
+    sliding window limits of unauthenticated endpoints
+    """
+
+    auth_per_ip: RateLimit
+    auth_per_email: RateLimit
+    guest_per_ip: RateLimit
+
+
+class RevocationConfig(BaseModel):
+    """
+    refresh tokens revocation, see jwt_module/revocation.py
+    """
+
+    # issue new refresh token on every refresh, reuse of old one revokes family
+    rotate_refresh_tokens: bool
+    # expected revoked ids kept at once, filter gets less exact above it
+    bloom_capacity: int
+    bloom_error_rate: float
+    # filter is rebuilt from redis to drop expired ids
+    rebuild_interval_seconds: int
 
 
 class Config(BaseModel):
     verification_code_time_expiration: int
+    # new code may be requested after this, must be shorter than expiration
+    verification_code_resend_cooldown_seconds: int
+    # failed checks before code is locked until it expires
+    verification_code_max_attempts: int
+    # hmac key for stored code hashes, same value for api and celery
+    verification_code_secret: str
     project_host: str
     jwt: AuthJWT
     smtp: SMTPConfig
+    grpc: GRPCConfig
+    quota: QuotaConfig
+    user_cache: UserCacheConfig
+    guest: GuestConfig
+    rate_limit: RateLimitConfig
+    revocation: RevocationConfig
 
     @field_validator("project_host")
     def validate_host(cls, value):
@@ -47,42 +170,105 @@ class Config(BaseModel):
             raise Exception("Config: project_host should be without /")
         return value
 
+    @field_validator("verification_code_resend_cooldown_seconds")
+    def validate_resend_cooldown(cls, value, info):
+        if value >= info.data["verification_code_time_expiration"]:
+            raise Exception(
+                "Config: verification code resend cooldown should be shorter"
+                " than its expiration"
+            )
+        return value
 
+    @field_validator("verification_code_secret")
+    def validate_code_secret(cls, value):
+        # without key code hashes could be brute forced from redis dumps
+        if not value:
+            raise Exception("Config: VERIFICATION_CODE_SECRET is required")
+        return value
+
+
+@functools.cache
 def load_config() -> Config:
     """
-    return config in modules that requires settings
+    return config in modules that requires settings,
+    built from env on first call, later calls return the same object
     :return: config with all parameters
     """
+    with startup_report.phase("config"):
+        return _build_config()
+
+
+def _build_config() -> Config:
     return Config(
         verification_code_time_expiration=60 * 5,
+        verification_code_resend_cooldown_seconds=60,
+        verification_code_max_attempts=5,
+        verification_code_secret=os.getenv("VERIFICATION_CODE_SECRET", ""),
         project_host="http://localhost:8000",
         jwt=AuthJWT(
-            public_key_path=Path(
-                os.path.join(BASE_DIR.parent, "certs", "jwt-public.pem")
-            ).read_text(),
-            private_key_path=Path(
-                os.path.join(BASE_DIR.parent, "certs", "jwt-private.pem")
-            ).read_text(),
-            algorithm="RS256",
+            keys_dir=os.getenv("JWT_KEYS_DIR", os.path.join(BASE_DIR.parent, "certs")),
+            active_kid=os.getenv("JWT_ACTIVE_KID", "jwt"),
+            keys_reload_interval_seconds=30,
             access_token_expire_minutes=3600,
             refresh_token_expire_days=10,
             token_type_field="token_type",
+            claims_profile=os.getenv("JWT_CLAIMS_PROFILE", "full"),
+            compact_claims_email=os.getenv("JWT_COMPACT_CLAIMS_EMAIL", True),
+            token_cache_size=10_000,
+            token_cache_negative_ttl_seconds=5,
         ),
         smtp=SMTPConfig(),
+        grpc=GRPCConfig(),
+        quota=QuotaConfig(
+            guest_requests_limit=20,
+            counter_ttl_seconds=60 * 60 * 24 * 30,
+            flush_interval_seconds=5,
+            flush_batch_size=500,
+        ),
+        user_cache=UserCacheConfig(
+            local_size=10_000,
+            local_ttl_seconds=60,
+            redis_ttl_seconds=60 * 60,
+        ),
+        guest=GuestConfig(
+            lazy_rows=True,
+            id_block_size=100,
+        ),
+        rate_limit=RateLimitConfig(
+            auth_per_ip=RateLimit(limit=20, window_seconds=60),
+            auth_per_email=RateLimit(limit=5, window_seconds=60 * 10),
+            guest_per_ip=RateLimit(limit=10, window_seconds=60),
+        ),
+        revocation=RevocationConfig(
+            rotate_refresh_tokens=True,
+            bloom_capacity=1_000_000,
+            bloom_error_rate=0.001,
+            rebuild_interval_seconds=60 * 60,
+        ),
     )
 
 
-def __load_db_config() -> DBConfig:
+@functools.cache
+def load_db_config() -> DBConfig:
+    """
+    database settings, built from env on first call
+    """
+    with startup_report.phase("config"):
+        return _build_db_config()
+
+
+def _build_db_config() -> DBConfig:
     return DBConfig(
         database_host=os.getenv("DATABASE_HOST"),
         database_port=os.getenv("DATABASE_PORT"),
         database_username=os.getenv("DATABASE_USERNAME"),
         database_password=os.getenv("DATABASE_PASSWORD"),
         database_name=os.getenv("DATABASE_NAME"),
+        database_replica_url=os.getenv("DATABASE_REPLICA_URL") or None,
+        database_pool_size=os.getenv("DATABASE_POOL_SIZE", 10),
+        database_max_overflow=os.getenv("DATABASE_MAX_OVERFLOW", 10),
+        database_pool_recycle=os.getenv("DATABASE_POOL_RECYCLE", 1800),
+        database_pool_pre_ping=os.getenv("DATABASE_POOL_PRE_PING", True),
+        database_statement_cache_size=os.getenv("DATABASE_STATEMENT_CACHE_SIZE", 100),
+        database_echo=os.getenv("DATABASE_ECHO", False),
     )
-
-
-try:
-    db_config: DBConfig = __load_db_config()
-except Exception:
-    pass
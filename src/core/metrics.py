@@ -0,0 +1,165 @@
+import functools
+import inspect
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# hot paths take microseconds (cached decode, redis on localhost),
+# default prometheus buckets start at 5ms and would hide them
+FAST_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+TOKEN_CREATE_SECONDS = Histogram(
+    "auth_token_create_seconds",
+    "Time to build and sign a jwt",
+    ["token_type"],
+    buckets=FAST_BUCKETS,
+)
+JWT_DECODE_SECONDS = Histogram(
+    "auth_jwt_decode_seconds",
+    "Time of jwt signature check and decode (token cache misses only)",
+    buckets=FAST_BUCKETS,
+)
+AUTH_REJECTIONS = Counter(
+    "auth_rejections_total",
+    "Requests rejected by auth dependencies",
+    ["status", "reason"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "auth_db_query_seconds",
+    "Time of UserService queries",
+    ["query"],
+    buckets=FAST_BUCKETS,
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "auth_redis_command_seconds",
+    "Time of redis commands (pipelines are one PIPELINE command)",
+    ["command"],
+    buckets=FAST_BUCKETS,
+)
+GRPC_REQUEST_SECONDS = Histogram(
+    "auth_grpc_request_seconds",
+    "Time of AuthService rpcs",
+    ["method"],
+    buckets=FAST_BUCKETS,
+)
+GRPC_IN_FLIGHT = Gauge(
+    "auth_grpc_in_flight",
+    "AuthService rpcs in progress",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+CELERY_TASK_SECONDS = Histogram(
+    "auth_celery_task_seconds",
+    "Time of celery tasks",
+    ["task", "state"],
+)
+STARTUP_PHASE_SECONDS = Gauge(
+    "auth_startup_phase_seconds",
+    "Time of process initialization phases",
+    ["phase"],
+    multiprocess_mode="max",
+)
+SMTP_SEND_SECONDS = Histogram(
+    "auth_smtp_send_seconds",
+    "Time to send one email over smtp session",
+    ["result"],
+)
+TOKEN_CACHE_LOOKUPS = Counter(
+    "auth_token_cache_lookups_total",
+    "Verified token cache lookups (hit includes cached invalid tokens)",
+    ["result"],
+)
+TOKEN_CACHE_ENTRIES = Gauge(
+    "auth_token_cache_entries",
+    "Tokens in verified token cache (token_cache_size is the limit per process)",
+    multiprocess_mode="livesum",
+)
+USER_CACHE_LOOKUPS = Counter(
+    "auth_user_cache_lookups_total",
+    "UserCache lookups by tier that answered (local, redis) or miss",
+    ["result"],
+)
+USER_CACHE_LOCAL_ENTRIES = Gauge(
+    "auth_user_cache_local_entries",
+    "Rows in in-process user cache (local_size is the limit per process)",
+    multiprocess_mode="livesum",
+)
+
+
+def timed(histogram: Histogram, **labels):
+    """
+    decorator observing duration of sync or async function,
+    failed calls are observed too
+    :param histogram: histogram to observe
+    :param labels: label values of histogram
+    """
+    metric = histogram.labels(**labels) if labels else histogram
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    metric.observe(time.perf_counter() - start)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    registry to export, with PROMETHEUS_MULTIPROC_DIR set (several uvicorn
+    or celery worker processes) metrics of all processes are merged
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    :return: metrics in prometheus text format and its content type
+    """
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable
+
+from src.core.redis_initializer import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# channel -> handlers, filled by modules at import time
+_handlers: dict[str, list[Callable[[str], None]]] = defaultdict(list)
+# called after every (re)subscribe, messages sent while disconnected are lost
+_subscribe_listeners: list[Callable[[], None]] = []
+
+
+def subscribe(channel: str, handler: Callable[[str], None]) -> None:
+    """
+    register handler for messages of redis pub/sub channel,
+    handlers run in the event loop, so they must be quick and non-blocking
+    :param channel: redis channel name
+    :param handler: called with message data (str)
+    """
+    _handlers[channel].append(handler)
+
+
+def add_subscribe_listener(listener: Callable[[], None]) -> None:
+    """
+    listener is called each time the listener (re)subscribes, use it to
+    reload state whose change messages could be missed, must not block
+    """
+    _subscribe_listeners.append(listener)
+
+
+async def publish(channel: str, message: str) -> None:
+    """
+    send message to every process listening the channel (sender included)
+    """
+    await get_async_redis().publish(channel, message)
+
+
+async def run_pubsub_listener(reconnect_delay: float = 1.0) -> None:
+    """
+    background task, dispatches messages of all subscribed channels,
+    re-subscribes after redis connection errors
+    """
+    if not _handlers:
+        return
+    while True:
+        pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(*_handlers)
+            for listener in _subscribe_listeners:
+                try:
+                    listener()
+                except Exception:
+                    logger.exception(f"Pub/sub subscribe listener failed: {listener}")
+            async for message in pubsub.listen():
+                for handler in _handlers.get(message["channel"], ()):
+                    try:
+                        handler(message["data"])
+                    except Exception:
+                        logger.exception(f"Pub/sub handler failed: {message}")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Pub/sub listener disconnected")
+            await asyncio.sleep(reconnect_delay)
+        finally:
+            await pubsub.aclose()
@@ -1,22 +1,106 @@
 import logging
 import os
+import time
 
 import redis
+import redis.asyncio
 from dotenv import load_dotenv
 
+from src.core.metrics import REDIS_COMMAND_SECONDS
+
 load_dotenv()
 _redis_client = None
+_async_redis_client = None
 REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PORT = os.getenv("REDIS_PORT")
 REDIS_DB = 0
+# max connections per process (each of sync and async pools)
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", 50))
+# seconds to wait for a free connection when pool is exhausted
+REDIS_POOL_TIMEOUT = int(os.getenv("REDIS_POOL_TIMEOUT", 5))
+
+
+def _redis_url() -> str:
+    return f"redis://{REDIS_HOST}:{REDIS_PORT}"
+
+
+class _InstrumentedPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_SECONDS.labels("PIPELINE").observe(
+                time.perf_counter() - start
+            )
+
+
+class InstrumentedRedis(redis.Redis):
+    """
+    sync client observing every command in REDIS_COMMAND_SECONDS
+    """
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(str(args[0])).observe(
+                time.perf_counter() - start
+            )
+
+    def pipeline(self, transaction=True, shard_hint=None) -> redis.client.Pipeline:
+        return _InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+class _AsyncInstrumentedPipeline(redis.asyncio.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_SECONDS.labels("PIPELINE").observe(
+                time.perf_counter() - start
+            )
+
+
+class AsyncInstrumentedRedis(redis.asyncio.Redis):
+    """
+    async client observing every command in REDIS_COMMAND_SECONDS
+    """
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(str(args[0])).observe(
+                time.perf_counter() - start
+            )
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: str | None = None
+    ) -> redis.asyncio.client.Pipeline:
+        return _AsyncInstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
 
 
 def init_redis():
+    """
+    sync client for celery tasks and scripts, never use it in async handlers
+    """
     global _redis_client
-    _redis_client = redis.Redis.from_url(
-        f"redis://{REDIS_HOST}:{REDIS_PORT}",
-        db=REDIS_DB,
-        decode_responses=True,
+    _redis_client = InstrumentedRedis(
+        connection_pool=redis.BlockingConnectionPool.from_url(
+            _redis_url(),
+            db=REDIS_DB,
+            decode_responses=True,
+            max_connections=REDIS_POOL_SIZE,
+            timeout=REDIS_POOL_TIMEOUT,
+        )
     )
     _redis_client.ping()
     logging.info("Redis connected")
@@ -26,6 +110,8 @@ def close_redis():
     global _redis_client
     if _redis_client:
         _redis_client.close()
+        _redis_client.connection_pool.disconnect()
+        _redis_client = None
         logging.warning("Redis disconnected")
 
 
@@ -34,3 +120,53 @@ def get_redis():
     if _redis_client is None:
         init_redis()
     return _redis_client
+
+
+def _create_async_redis() -> redis.asyncio.Redis:
+    return AsyncInstrumentedRedis(
+        connection_pool=redis.asyncio.BlockingConnectionPool.from_url(
+            _redis_url(),
+            db=REDIS_DB,
+            decode_responses=True,
+            max_connections=REDIS_POOL_SIZE,
+            timeout=REDIS_POOL_TIMEOUT,
+        )
+    )
+
+
+async def init_async_redis():
+    """
+    open shared async pool, called from app lifespan
+    """
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = _create_async_redis()
+    await _async_redis_client.ping()
+    logging.info("Async redis connected")
+
+
+async def close_async_redis():
+    global _async_redis_client
+    if _async_redis_client:
+        await _async_redis_client.aclose()
+        await _async_redis_client.connection_pool.disconnect()
+        _async_redis_client = None
+        logging.warning("Async redis disconnected")
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """
+    non-blocking redis client for async handlers
+    (connections are opened lazily on first command)
+    """
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = _create_async_redis()
+    return _async_redis_client
+
+
+async def get_async_redis_dependency() -> redis.asyncio.Redis:
+    """
+    fastapi dependency, async so it is not sent to threadpool
+    """
+    return get_async_redis()
@@ -0,0 +1,42 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from src.core.metrics import STARTUP_PHASE_SECONDS
+
+
+class StartupReport:
+    """
+    time spent in initialization phases of the process,
+    phases with the same name are summed
+    """
+
+    def __init__(self):
+        self._phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._phases[name] = self._phases.get(name, 0.0) + elapsed
+
+    def phases(self) -> dict[str, float]:
+        return dict(self._phases)
+
+    def log(self, logger: logging.Logger) -> None:
+        """
+        log phases and export them as auth_startup_phase_seconds
+        """
+        for name, seconds in self._phases.items():
+            STARTUP_PHASE_SECONDS.labels(name).set(seconds)
+        report = ", ".join(
+            f"{name} {seconds * 1000:.1f}ms" for name, seconds in self._phases.items()
+        )
+        total = sum(self._phases.values()) * 1000
+        logger.info(f"Startup phases: {report} (total {total:.1f}ms)")
+
+
+startup_report = StartupReport()
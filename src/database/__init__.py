@@ -1,4 +1,4 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
@@ -6,19 +6,63 @@ from sqlalchemy.orm import (
     sessionmaker,
 )
 
-from src.core.config import db_config
+from src.core.config import load_db_config
+from src.database.migrations import lock_migrations, run_migrations
+
+db_config = load_db_config()
 
 DATABASE_URL = f"postgresql+asyncpg://{db_config.database_username}:{db_config.database_password}@{db_config.database_host}:{db_config.database_port}/{db_config.database_name}"
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+
+def _create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=db_config.database_echo,
+        pool_size=db_config.database_pool_size,
+        max_overflow=db_config.database_max_overflow,
+        pool_recycle=db_config.database_pool_recycle,
+        pool_pre_ping=db_config.database_pool_pre_ping,
+        connect_args={
+            # sqlalchemy asyncpg dialect cache and asyncpg own cache
+            "prepared_statement_cache_size": db_config.database_statement_cache_size,
+            "statement_cache_size": db_config.database_statement_cache_size,
+        },
+    )
+
+
+engine = _create_engine(DATABASE_URL)
+# replica is optional, reads go to primary without it
+read_engine = (
+    _create_engine(db_config.database_replica_url)
+    if db_config.database_replica_url
+    else engine
+)
+# writes and reads that must see own writes
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# reads that can tolerate replication lag
+async_read_session = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 
 class Base(DeclarativeBase):
     id: Mapped[int] = mapped_column(primary_key=True)
 
 
-async def init_models():
+async def init_models() -> list[int]:
+    """
+    create tables and apply migrations in one transaction
+    :return: ids of users removed or changed by migrations, drop them from caches
+    """
     async with engine.begin() as conn:
+        # processes starting together wait here instead of racing on DDL
+        await lock_migrations(conn)
         # await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+        return await run_migrations(conn)
+
+
+async def close_engines():
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
@@ -0,0 +1,88 @@
+"""
+schema changes create_all can not apply to existing tables,
+every step is idempotent and runs on each start under an advisory lock
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.modules.reg_module.jwt_module.claims import DEFAULT_ROLE_IDS
+
+# any constant, shared by all processes of the service
+MIGRATIONS_LOCK_ID = 730_024
+
+
+async def lock_migrations(conn: AsyncConnection) -> None:
+    """
+    transaction level lock, released on commit or rollback
+    """
+    await conn.execute(
+        text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATIONS_LOCK_ID}
+    )
+
+
+async def seed_roles(conn: AsyncConnection) -> None:
+    """
+    insert missing roles of claims.DEFAULT_ROLE_IDS (the one source of
+    seeded role ids), rows edited by operators are kept
+    """
+    await conn.execute(
+        text("INSERT INTO roles (id, name) VALUES (:id, :name) ON CONFLICT DO NOTHING"),
+        [{"id": role_id, "name": name} for name, role_id in DEFAULT_ROLE_IDS.items()],
+    )
+    # explicit ids do not move the sequence, roles added later must not collide
+    await conn.execute(
+        text(
+            "SELECT setval(pg_get_serial_sequence('roles', 'id'), "
+            "(SELECT max(id) FROM roles))"
+        )
+    )
+
+
+async def dedupe_users_by_email(conn: AsyncConnection) -> list[int]:
+    """
+    keep the newest row of every email ignoring case (tokens of the last login
+    stay valid), delete older ones and lowercase the rest, login emails are
+    lowercased since then. skipped once the lower(email) index exists
+    :return: ids of deleted and changed users
+    """
+    index = await conn.execute(text("SELECT to_regclass('ix_users_email_lower')"))
+    if index.scalar() is not None:
+        return []
+    deleted = await conn.execute(
+        text(
+            "DELETE FROM users AS older USING users AS newer "
+            "WHERE lower(older.email) = lower(newer.email) AND older.id < newer.id "
+            "RETURNING older.id"
+        )
+    )
+    lowercased = await conn.execute(
+        text(
+            "UPDATE users SET email = lower(email) "
+            "WHERE email <> lower(email) RETURNING id"
+        )
+    )
+    return [*deleted.scalars(), *lowercased.scalars()]
+
+
+async def run_migrations(conn: AsyncConnection) -> list[int]:
+    """
+    :param conn: connection in transaction holding lock_migrations
+    :return: ids of users removed or changed by migrations
+    """
+    await seed_roles(conn)
+    changed_user_ids = await dedupe_users_by_email(conn)
+    await conn.execute(
+        text("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)")
+    )
+    # writers that skip normalization fail here instead of adding a twin row
+    await conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email_lower "
+            "ON users (lower(email))"
+        )
+    )
+    await conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_users_role_id ON users (role_id)")
+    )
+    return changed_user_ids
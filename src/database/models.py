@@ -1,8 +1,15 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import Column, ForeignKey, Table
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
 
+role_permissions = Table(
+    "role_permissions",
+    Base.metadata,
+    Column("role_id", ForeignKey("roles.id"), primary_key=True),
+    Column("permission_id", ForeignKey("permissions.id"), primary_key=True),
+)
+
 
 class Role(Base):
     __tablename__ = "roles"
@@ -12,14 +19,30 @@ class Role(Base):
 
     # Добавляем обратную связь
     users = relationship("User", back_populates="role")
+    permissions = relationship(
+        "Permission", secondary=role_permissions, back_populates="roles"
+    )
+
+
+class Permission(Base):
+    __tablename__ = "permissions"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # scope name put into access tokens, e.g. "profile:read"
+    name: Mapped[str] = mapped_column(unique=True)
+
+    roles = relationship(
+        "Role", secondary=role_permissions, back_populates="permissions"
+    )
 
 
 class User(Base):
     __tablename__ = "users"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    email: Mapped[str] = mapped_column(nullable=True)
-    role_id: Mapped[int] = mapped_column(ForeignKey("roles.id"))
+    # unique: login upserts by email, guests have NULL (NULLs never conflict)
+    email: Mapped[str] = mapped_column(nullable=True, unique=True, index=True)
+    role_id: Mapped[int] = mapped_column(ForeignKey("roles.id"), index=True)
 
     # Связь к роли
     role = relationship("Role", back_populates="users")
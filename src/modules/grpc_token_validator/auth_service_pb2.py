@@ -20,7 +20,7 @@ _sym_db = _symbol_database.Default()
 
 
 DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(
-    b'\n\x12\x61uth_service.proto\x12\x04\x61uth"\x1d\n\x0cTokenRequest\x12\r\n\x05token\x18\x01 \x01(\t"\x8d\x01\n\rTokenResponse\x12\r\n\x05valid\x18\x01 \x01(\x08\x12/\n\x06\x63laims\x18\x02 \x03(\x0b\x32\x1f.auth.TokenResponse.ClaimsEntry\x12\r\n\x05\x65rror\x18\x03 \x01(\t\x1a-\n\x0b\x43laimsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x32\x44\n\x0b\x41uthService\x12\x35\n\nCheckToken\x12\x12.auth.TokenRequest\x1a\x13.auth.TokenResponseb\x06proto3'
+    b'\n\x12\x61uth_service.proto\x12\x04\x61uth"\x1d\n\x0cTokenRequest\x12\r\n\x05token\x18\x01 \x01(\t"\x8d\x01\n\rTokenResponse\x12\r\n\x05valid\x18\x01 \x01(\x08\x12/\n\x06\x63laims\x18\x02 \x03(\x0b\x32\x1f.auth.TokenResponse.ClaimsEntry\x12\r\n\x05\x65rror\x18\x03 \x01(\t\x1a-\n\x0b\x43laimsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01"\x1f\n\rTokensRequest\x12\x0e\n\x06tokens\x18\x01 \x03(\t"6\n\x0eTokensResponse\x12$\n\x07results\x18\x01 \x03(\x0b\x32\x13.auth.TokenResponse"-\n\x0cQuotaRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x0e\n\x06\x61mount\x18\x02 \x01(\x05"L\n\rQuotaResponse\x12\x0f\n\x07\x61llowed\x18\x01 \x01(\x08\x12\x0c\n\x04used\x18\x02 \x01(\x03\x12\r\n\x05limit\x18\x03 \x01(\x03\x12\r\n\x05\x65rror\x18\x04 \x01(\t2\xf8\x01\n\x0b\x41uthService\x12\x35\n\nCheckToken\x12\x12.auth.TokenRequest\x1a\x13.auth.TokenResponse\x12\x38\n\x0b\x43heckTokens\x12\x13.auth.TokensRequest\x1a\x14.auth.TokensResponse\x12?\n\x10\x43heckTokenStream\x12\x12.auth.TokenRequest\x1a\x13.auth.TokenResponse(\x01\x30\x01\x12\x37\n\x0c\x43onsumeQuota\x12\x12.auth.QuotaRequest\x1a\x13.auth.QuotaResponseb\x06proto3'
 )
 
 _globals = globals()
@@ -36,6 +36,14 @@ if not _descriptor._USE_C_DESCRIPTORS:
     _globals["_TOKENRESPONSE"]._serialized_end = 201
     _globals["_TOKENRESPONSE_CLAIMSENTRY"]._serialized_start = 156
     _globals["_TOKENRESPONSE_CLAIMSENTRY"]._serialized_end = 201
-    _globals["_AUTHSERVICE"]._serialized_start = 203
-    _globals["_AUTHSERVICE"]._serialized_end = 271
+    _globals["_TOKENSREQUEST"]._serialized_start = 203
+    _globals["_TOKENSREQUEST"]._serialized_end = 234
+    _globals["_TOKENSRESPONSE"]._serialized_start = 236
+    _globals["_TOKENSRESPONSE"]._serialized_end = 290
+    _globals["_QUOTAREQUEST"]._serialized_start = 292
+    _globals["_QUOTAREQUEST"]._serialized_end = 337
+    _globals["_QUOTARESPONSE"]._serialized_start = 339
+    _globals["_QUOTARESPONSE"]._serialized_end = 415
+    _globals["_AUTHSERVICE"]._serialized_start = 418
+    _globals["_AUTHSERVICE"]._serialized_end = 666
 # @@protoc_insertion_point(module_scope)
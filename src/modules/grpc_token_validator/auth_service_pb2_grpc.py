@@ -43,6 +43,24 @@ class AuthServiceStub(object):
             response_deserializer=auth__service__pb2.TokenResponse.FromString,
             _registered_method=True,
         )
+        self.CheckTokens = channel.unary_unary(
+            "/auth.AuthService/CheckTokens",
+            request_serializer=auth__service__pb2.TokensRequest.SerializeToString,
+            response_deserializer=auth__service__pb2.TokensResponse.FromString,
+            _registered_method=True,
+        )
+        self.CheckTokenStream = channel.stream_stream(
+            "/auth.AuthService/CheckTokenStream",
+            request_serializer=auth__service__pb2.TokenRequest.SerializeToString,
+            response_deserializer=auth__service__pb2.TokenResponse.FromString,
+            _registered_method=True,
+        )
+        self.ConsumeQuota = channel.unary_unary(
+            "/auth.AuthService/ConsumeQuota",
+            request_serializer=auth__service__pb2.QuotaRequest.SerializeToString,
+            response_deserializer=auth__service__pb2.QuotaResponse.FromString,
+            _registered_method=True,
+        )
 
 
 class AuthServiceServicer(object):
@@ -54,6 +72,24 @@ class AuthServiceServicer(object):
         context.set_details("Method not implemented!")
         raise NotImplementedError("Method not implemented!")
 
+    def CheckTokens(self, request, context):
+        """validates many tokens in one call, results keep the request order"""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def CheckTokenStream(self, request_iterator, context):
+        """long-lived stream, one response per request in the same order"""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def ConsumeQuota(self, request, context):
+        """atomic check-and-increment of guest free requests counter"""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
 
 def add_AuthServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -62,6 +98,21 @@ def add_AuthServiceServicer_to_server(servicer, server):
             request_deserializer=auth__service__pb2.TokenRequest.FromString,
             response_serializer=auth__service__pb2.TokenResponse.SerializeToString,
         ),
+        "CheckTokens": grpc.unary_unary_rpc_method_handler(
+            servicer.CheckTokens,
+            request_deserializer=auth__service__pb2.TokensRequest.FromString,
+            response_serializer=auth__service__pb2.TokensResponse.SerializeToString,
+        ),
+        "CheckTokenStream": grpc.stream_stream_rpc_method_handler(
+            servicer.CheckTokenStream,
+            request_deserializer=auth__service__pb2.TokenRequest.FromString,
+            response_serializer=auth__service__pb2.TokenResponse.SerializeToString,
+        ),
+        "ConsumeQuota": grpc.unary_unary_rpc_method_handler(
+            servicer.ConsumeQuota,
+            request_deserializer=auth__service__pb2.QuotaRequest.FromString,
+            response_serializer=auth__service__pb2.QuotaResponse.SerializeToString,
+        ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
         "auth.AuthService", rpc_method_handlers
@@ -103,3 +154,93 @@ class AuthService(object):
             metadata,
             _registered_method=True,
         )
+
+    @staticmethod
+    def CheckTokens(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/auth.AuthService/CheckTokens",
+            auth__service__pb2.TokensRequest.SerializeToString,
+            auth__service__pb2.TokensResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True,
+        )
+
+    @staticmethod
+    def CheckTokenStream(
+        request_iterator,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            "/auth.AuthService/CheckTokenStream",
+            auth__service__pb2.TokenRequest.SerializeToString,
+            auth__service__pb2.TokenResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True,
+        )
+
+    @staticmethod
+    def ConsumeQuota(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/auth.AuthService/ConsumeQuota",
+            auth__service__pb2.QuotaRequest.SerializeToString,
+            auth__service__pb2.QuotaResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True,
+        )
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+
+import grpc
+
+from src.modules.grpc_token_validator import auth_service_pb2, auth_service_pb2_grpc
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingTokenClient:
+    """
+    async CheckToken client that groups concurrent lookups into CheckTokens calls
+
+    every check() issued during max_delay seconds (or until max_batch_size
+    tokens are queued) is sent as one batch, callers get their own result back
+
+    usage:
+        client = BatchingTokenClient("auth:50051")
+        response = await client.check(token)
+        await client.close()
+    """
+
+    def __init__(
+        self,
+        target: str,
+        max_batch_size: int = 256,
+        max_delay: float = 0.002,
+        timeout: float | None = 5.0,
+    ):
+        self._channel = grpc.aio.insecure_channel(target)
+        self._stub = auth_service_pb2_grpc.AuthServiceStub(self._channel)
+        self._max_batch_size = max_batch_size
+        self._max_delay = max_delay
+        self._timeout = timeout
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+    async def check(self, token: str) -> auth_service_pb2.TokenResponse:
+        """
+        queue token for the next batch and wait for its result
+        :param token: jwt access token
+        :return: token response in the same shape as CheckToken
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((token, future))
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._send(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        try:
+            response = await self._stub.CheckTokens(
+                auth_service_pb2.TokensRequest(tokens=[token for token, _ in batch]),
+                timeout=self._timeout,
+            )
+            # results are matched to callers by position
+            if len(response.results) != len(batch):
+                raise Exception(
+                    f"CheckTokens returned {len(response.results)} results"
+                    f" for {len(batch)} tokens"
+                )
+        except Exception as e:
+            logger.exception("CheckTokens batch failed")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, response.results, strict=True):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """
+        send queued tokens, wait for in-flight batches and close the channel
+        """
+        self._flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        await self._channel.close()
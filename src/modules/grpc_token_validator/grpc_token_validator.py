@@ -1,51 +1,166 @@
 # auth_service_server.py
 import asyncio
+import functools
+import inspect
 import logging
-import threading
-from concurrent import futures
+import time
 
 import grpc
 import jwt
 from fastapi import HTTPException
 
 from src.core.config import load_config
+from src.core.metrics import GRPC_IN_FLIGHT, GRPC_REQUEST_SECONDS
 from src.modules.grpc_token_validator import auth_service_pb2, auth_service_pb2_grpc
-from src.modules.reg_module.jwt_module.depends import validate_access_token_payload
+from src.modules.quota.quota_store import quota_store
+from src.modules.reg_module.jwt_module.depends import (
+    decode_access_token,
+    validate_access_token_claims,
+    validate_access_token_payload,
+)
+from src.services.role_catalog import GUEST_ROLE
 
 config = load_config()
 logger = logging.getLogger(__name__)
 
 
+def _instrumented(rpc):
+    """
+    observe rpc duration and count it in flight,
+    for streaming rpcs duration is the lifetime of the stream
+    """
+    latency = GRPC_REQUEST_SECONDS.labels(rpc.__name__)
+    in_flight = GRPC_IN_FLIGHT.labels(rpc.__name__)
+    if inspect.isasyncgenfunction(rpc):
+
+        @functools.wraps(rpc)
+        async def stream_wrapper(self, request_iterator, context):
+            start = time.perf_counter()
+            in_flight.inc()
+            try:
+                async for response in rpc(self, request_iterator, context):
+                    yield response
+            finally:
+                in_flight.dec()
+                latency.observe(time.perf_counter() - start)
+
+        return stream_wrapper
+
+    @functools.wraps(rpc)
+    async def wrapper(self, request, context):
+        start = time.perf_counter()
+        in_flight.inc()
+        try:
+            return await rpc(self, request, context)
+        finally:
+            in_flight.dec()
+            latency.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def token_claims(payload: dict) -> dict[str, str]:
+    """
+    token payload as grpc claims map (proto map<string, string>),
+    "scope" (space separated permission names) is always present
+    """
+    claims = {k: str(v) for k, v in payload.items()}
+    claims.setdefault("scope", "")
+    return claims
+
+
 class AuthServiceServicer(auth_service_pb2_grpc.AuthServiceServicer):
-    def CheckToken(self, request, context):
-        token: str = request.token
+    @staticmethod
+    async def _check_token(token: str) -> auth_service_pb2.TokenResponse:
+        """
+        validate one access token, errors are returned inside response
+        so one bad token never fails a whole batch or stream
+        :param token: jwt access token
+        :return: grpc token response with claims or error
+        """
         try:
-            payload: dict = jwt.decode(
-                token, config.jwt.public_key_path, algorithms=[config.jwt.algorithm]
-            )
-            asyncio.run(validate_access_token_payload(payload))
+            payload: dict = decode_access_token(token)
+            await validate_access_token_payload(payload)
             return auth_service_pb2.TokenResponse(
-                valid=True,
-                claims={
-                    k: str(v) if not isinstance(v, (int, float)) else str(v)
-                    for k, v in payload.items()
-                },
+                valid=True, claims=token_claims(payload)
             )
+        except jwt.InvalidTokenError:
+            return auth_service_pb2.TokenResponse(valid=False, error="Invalid token")
         except HTTPException as e:
             return auth_service_pb2.TokenResponse(valid=False, error=str(e.detail))
 
+    @_instrumented
+    async def CheckToken(self, request, context):
+        return await self._check_token(request.token)
+
+    @_instrumented
+    async def CheckTokens(self, request, context):
+        # gather keeps results in request order
+        results = await asyncio.gather(
+            *(self._check_token(token) for token in request.tokens)
+        )
+        return auth_service_pb2.TokensResponse(results=results)
+
+    @_instrumented
+    async def CheckTokenStream(self, request_iterator, context):
+        async for request in request_iterator:
+            yield await self._check_token(request.token)
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    @_instrumented
+    async def ConsumeQuota(self, request, context):
+        # int32 on the wire, negative amount would give quota back
+        if request.amount < 0:
+            return auth_service_pb2.QuotaResponse(
+                allowed=False, error="Amount must not be negative"
+            )
+        try:
+            payload: dict = decode_access_token(request.token)
+            validate_access_token_claims(payload)
+        except jwt.InvalidTokenError:
+            return auth_service_pb2.QuotaResponse(allowed=False, error="Invalid token")
+        except HTTPException as e:
+            return auth_service_pb2.QuotaResponse(allowed=False, error=str(e.detail))
+        # only guests have free requests limit
+        if payload["role"] != GUEST_ROLE:
+            return auth_service_pb2.QuotaResponse(allowed=True)
+        result = await quota_store.consume(
+            user_id=int(payload["sub"]), amount=request.amount or 1
+        )
+        return auth_service_pb2.QuotaResponse(
+            allowed=result.allowed,
+            used=result.used,
+            limit=result.limit,
+            error="" if result.allowed else "Your free requests are over",
+        )
+
+
+async def start_grpc() -> grpc.aio.Server:
+    """
+    start grpc.aio server on the running event loop
+    so rpcs share the app loop, redis and db pools
+    :return: started server, pass it to stop_grpc on shutdown
+    """
+    server = grpc.aio.server(
+        maximum_concurrent_rpcs=config.grpc.GRPC_MAX_CONCURRENT_RPCS,
+        # several processes (grpc_main.py workers) listen on one port,
+        # kernel spreads connections between them
+        options=[("grpc.so_reuseport", 1)],
+    )
     auth_service_pb2_grpc.add_AuthServiceServicer_to_server(
         AuthServiceServicer(), server
     )
-    server.add_insecure_port("[::]:50051")
-    server.start()
-    logger.info("Auth gRPC server running on port 50051...")
-    server.wait_for_termination()
+    address = f"{config.grpc.GRPC_HOST}:{config.grpc.GRPC_PORT}"
+    server.add_insecure_port(address)
+    await server.start()
+    logger.info(f"Auth gRPC server running on {address}...")
+    return server
 
 
-def run_grpc():
-    grpc_thread = threading.Thread(target=serve, daemon=True)
-    grpc_thread.start()
+async def stop_grpc(server: grpc.aio.Server, grace: float = 5.0) -> None:
+    """
+    stop accepting rpcs and wait up to grace seconds for in-flight ones
+    :param server: server returned by start_grpc
+    :param grace: seconds to finish in-flight rpcs
+    """
+    await server.stop(grace)
+    logger.warning("Auth gRPC server stopped")
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import urllib.request
+
+import grpc
+import jwt
+
+from src.modules.grpc_token_validator import auth_service_pb2, auth_service_pb2_grpc
+from src.modules.reg_module.jwt_module.claims import (
+    DEFAULT_ROLE_NAMES,
+    normalize_claims,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTokenVerifier:
+    """
+    verifies access tokens inside the calling service with keys from auth
+    service /.well-known/jwks.json, auth service is called over grpc only
+    for checks that need its state (guest free requests)
+
+    tokens without kid header (issued before keys had ids) are verified
+    with default_kid, or with the only jwks key when default_kid is not set
+
+    when jwks can't be downloaded previous keys are kept and the next attempt
+    is made after min_refresh_interval, only tokens of unknown kid fail
+
+    usage:
+        verifier = LocalTokenVerifier(
+            "http://auth:8000/.well-known/jwks.json", grpc_target="auth:50051"
+        )
+        response = await verifier.check(token)  # same shape as CheckToken response
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        grpc_target: str | None = None,
+        cache_seconds: float = 300,
+        min_refresh_interval: float = 30,
+        token_type_field: str = "token_type",
+        timeout: float = 5.0,
+        role_names: dict[int, str] = DEFAULT_ROLE_NAMES,
+        default_kid: str | None = None,
+    ):
+        self._jwks_url = jwks_url
+        self._cache_seconds = cache_seconds
+        self._min_refresh_interval = min_refresh_interval
+        self._token_type_field = token_type_field
+        self._timeout = timeout
+        # role ids of compact tokens, set when roles differ from seeded ones
+        self._role_names = role_names
+        # key of tokens without kid header (issued before keys had ids),
+        # the only jwks key is used when not set
+        self._default_kid = default_kid
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._channel = grpc.aio.insecure_channel(grpc_target) if grpc_target else None
+        self._stub = (
+            auth_service_pb2_grpc.AuthServiceStub(self._channel)
+            if self._channel
+            else None
+        )
+
+    def refresh_keys(self) -> None:
+        """
+        download jwks (blocking), keys that fail to parse are skipped
+        """
+        with urllib.request.urlopen(self._jwks_url, timeout=self._timeout) as response:
+            jwks = json.load(response)
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            try:
+                keys[jwk["kid"]] = jwt.PyJWK(jwk)
+            except jwt.PyJWTError:
+                logger.warning(f"Skipping unsupported jwk {jwk.get('kid')}")
+        now = time.monotonic()
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = now
+            self._expires_at = now + self._cache_seconds
+
+    def _try_refresh_keys(self) -> None:
+        """
+        refresh_keys that never raises, on failure cached keys stay in use
+        """
+        try:
+            self.refresh_keys()
+        except Exception:
+            logger.exception("JWKS refresh failed, keeping cached keys")
+            now = time.monotonic()
+            with self._lock:
+                self._fetched_at = now
+                self._expires_at = max(
+                    self._expires_at, now + self._min_refresh_interval
+                )
+
+    def _needs_refresh(self, kid: str | None) -> bool:
+        now = time.monotonic()
+        if now >= self._expires_at:
+            return True
+        # unknown kid may be a just rotated key, but don't let garbage
+        # tokens make us download jwks on every call
+        return self._key_for(kid) is None and (
+            now - self._fetched_at >= self._min_refresh_interval
+        )
+
+    def _key_for(self, kid: str | None) -> jwt.PyJWK | None:
+        keys = self._keys
+        if kid is None:
+            if self._default_kid is not None:
+                return keys.get(self._default_kid)
+            return next(iter(keys.values())) if len(keys) == 1 else None
+        return keys.get(kid)
+
+    def verify(self, token: str) -> dict:
+        """
+        verify signature, expiration and token type locally (blocking on jwks refresh)
+        :param token: jwt access token
+        :return: token payload
+        :raise: jwt.InvalidTokenError if token is invalid
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        if self._needs_refresh(kid):
+            self._try_refresh_keys()
+        return self._decode(token, kid)
+
+    def _decode(self, token: str, kid: str | None) -> dict:
+        key = self._key_for(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown key id {kid!r}")
+        payload = normalize_claims(
+            jwt.decode(token, key.key, algorithms=[key.algorithm_name]),
+            self._token_type_field,
+            role_names=self._role_names,
+        )
+        if payload.get(self._token_type_field) != "access_token":
+            raise jwt.InvalidTokenError("Invalid token type")
+        return payload
+
+    async def check(self, token: str) -> auth_service_pb2.TokenResponse:
+        """
+        async version of verify returning CheckToken-like response,
+        guest tokens are sent to auth service CheckToken (quota lives there)
+        :param token: jwt access token
+        :return: token response with claims or error
+        """
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            if self._needs_refresh(kid):
+                await asyncio.to_thread(self._try_refresh_keys)
+            payload = self._decode(token, kid)
+        except jwt.InvalidTokenError as e:
+            return auth_service_pb2.TokenResponse(valid=False, error=str(e))
+        if payload.get("role") == "guest" and self._stub is not None:
+            return await self._stub.CheckToken(
+                auth_service_pb2.TokenRequest(token=token), timeout=self._timeout
+            )
+        claims = {k: str(v) for k, v in payload.items()}
+        # same as CheckToken, permission decisions use "scope" claim
+        claims.setdefault("scope", "")
+        return auth_service_pb2.TokenResponse(valid=True, claims=claims)
+
+    async def close(self) -> None:
+        if self._channel is not None:
+            await self._channel.close()
@@ -0,0 +1,29 @@
+import hashlib
+import json
+
+from fastapi import APIRouter, Request, Response, status
+
+from ..reg_module.jwt_module.key_manager import get_key_manager
+
+router: APIRouter = APIRouter(tags=["jwks"])
+
+# verifiers re-fetch on unknown kid anyway, so new keys are picked up quickly
+JWKS_MAX_AGE_SECONDS = 300
+
+
+@router.get("/.well-known/jwks.json")
+async def get_jwks(request: Request) -> Response:
+    """
+    public keys for local token verification in other services
+    :param request: base fastapi request
+    :return: JSON Web Key Set with cache headers (304 if ETag matches)
+    """
+    body = json.dumps(get_key_manager().jwks(), separators=(",", ":"))
+    etag = f'"{hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]}"'
+    headers = {
+        "Cache-Control": f"public, max-age={JWKS_MAX_AGE_SECONDS}",
+        "ETag": etag,
+    }
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Response
+
+from src.core.metrics import render_metrics
+
+router: APIRouter = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """
+    prometheus scrape endpoint
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
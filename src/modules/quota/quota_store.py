@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from typing import NamedTuple
+
+from src.core.config import load_config
+from src.core.redis_initializer import get_async_redis
+from src.services.user_services import UserService
+
+logger = logging.getLogger(__name__)
+config = load_config()
+
+COUNTER_KEY = "quota:used:{user_id}"
+DIRTY_KEY = "quota:dirty"
+
+# KEYS[1] counter, KEYS[2] dirty set
+# ARGV[1] amount, ARGV[2] limit, ARGV[3] user id, ARGV[4] counter ttl
+# returns {allowed, used}, allowed = -1 when counter is not loaded yet,
+# non-positive amount is an error (INCRBY would give quota back)
+CONSUME_SCRIPT = """
+local amount = tonumber(ARGV[1])
+if not amount or amount <= 0 then
+    return redis.error_reply('ERR quota amount must be positive')
+end
+local used = redis.call('GET', KEYS[1])
+if not used then
+    return {-1, 0}
+end
+used = tonumber(used)
+if used + amount > tonumber(ARGV[2]) then
+    return {0, used}
+end
+used = redis.call('INCRBY', KEYS[1], amount)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('SADD', KEYS[2], ARGV[3])
+return {1, used}
+"""
+
+
+class QuotaResult(NamedTuple):
+    allowed: bool
+    used: int
+    limit: int
+
+
+class QuotaStore:
+    """
+    per-user requests counters kept in redis
+
+    counters are loaded from users.requests_count once (on cold key),
+    then consumed atomically in redis with a lua script and written back
+    to postgres in batches by run_quota_flusher, so hot path never touches db
+    """
+
+    def __init__(self, limit: int, counter_ttl: int):
+        self.limit = limit
+        self._counter_ttl = counter_ttl
+        self._consume_script = None
+
+    @staticmethod
+    def _counter_key(user_id: int) -> str:
+        return COUNTER_KEY.format(user_id=user_id)
+
+    async def _load_counter(self, user_id: int) -> None:
+        """
+        copy counter from postgres to redis, if other process has already
+        loaded (and maybe changed) it, redis value wins
+        """
+        used = await UserService.get_user_reqs_count(user_id=user_id) or 0
+        await get_async_redis().set(
+            self._counter_key(user_id), used, nx=True, ex=self._counter_ttl
+        )
+
+    async def peek(self, user_id: int) -> int:
+        """
+        :param user_id: user id
+        :return: used requests count
+        """
+        used = await get_async_redis().get(self._counter_key(user_id))
+        if used is None:
+            await self._load_counter(user_id)
+            used = await get_async_redis().get(self._counter_key(user_id))
+        return int(used or 0)
+
+    async def consume(self, user_id: int, amount: int = 1) -> QuotaResult:
+        """
+        atomic check-and-increment of user counter
+        :param user_id: user id
+        :param amount: requests to consume, positive
+        :return: allowed flag and used count after the call
+        :raise: ValueError if amount is not positive
+        """
+        if amount < 1:
+            raise ValueError(f"Quota amount must be positive, got {amount}")
+        redis_client = get_async_redis()
+        if getattr(self._consume_script, "registered_client", None) is not redis_client:
+            self._consume_script = redis_client.register_script(CONSUME_SCRIPT)
+        keys = [self._counter_key(user_id), DIRTY_KEY]
+        args = [amount, self.limit, user_id, self._counter_ttl]
+        allowed, used = await self._consume_script(keys=keys, args=args)
+        if allowed == -1:
+            await self._load_counter(user_id)
+            allowed, used = await self._consume_script(keys=keys, args=args)
+        return QuotaResult(allowed=allowed == 1, used=int(used), limit=self.limit)
+
+    async def flush(self, batch_size: int) -> int:
+        """
+        write changed counters back to users.requests_count
+        :param batch_size: max users written in one statement
+        :return: number of flushed users
+        """
+        redis_client = get_async_redis()
+        user_ids = await redis_client.spop(DIRTY_KEY, batch_size)
+        if not user_ids:
+            return 0
+        values = await redis_client.mget(
+            [self._counter_key(user_id) for user_id in user_ids]
+        )
+        counts = {
+            int(user_id): int(value)
+            for user_id, value in zip(user_ids, values, strict=True)
+            if value is not None
+        }
+        try:
+            await UserService.set_requests_counts(counts)
+        except Exception:
+            # put them back, next flush will retry
+            await redis_client.sadd(DIRTY_KEY, *user_ids)
+            raise
+        return len(counts)
+
+
+quota_store = QuotaStore(
+    limit=config.quota.guest_requests_limit,
+    counter_ttl=config.quota.counter_ttl_seconds,
+)
+
+
+async def run_quota_flusher(interval: float, batch_size: int) -> None:
+    """
+    background task, periodically writes quota counters to postgres
+    :param interval: seconds between flushes
+    :param batch_size: max users per update statement
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            while await quota_store.flush(batch_size) == batch_size:
+                pass
+        except Exception:
+            logger.exception("Quota flush failed")
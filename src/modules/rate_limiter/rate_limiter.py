@@ -0,0 +1,96 @@
+import hashlib
+import math
+import secrets
+import time
+from typing import Callable
+
+import redis.asyncio
+from fastapi import Depends, HTTPException, Request, status
+
+from src.core.redis_initializer import get_async_redis_dependency
+
+LIMIT_KEY = "ratelimit:{scope}:{identity}"
+
+# KEYS[1] zset of hits, ARGV[1] now ms, ARGV[2] window ms, ARGV[3] limit, ARGV[4] hit id
+# returns 0 when hit is allowed, otherwise ms until the oldest hit leaves the window
+HIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return math.max(tonumber(oldest[2]) + window - now, 1)
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], window)
+return 0
+"""
+
+
+class SlidingWindowLimiter:
+    """
+    allows limit hits per identity (ip, email...) in any window_seconds period,
+    check and record is one lua call
+    """
+
+    def __init__(self, scope: str, limit: int, window_seconds: int):
+        self.scope = scope
+        self._limit = limit
+        self._window_ms = window_seconds * 1000
+        self._script = None
+
+    def _key(self, identity: str) -> str:
+        # identities are hashed, so emails don't appear in redis keys
+        identity_hash = hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+        return LIMIT_KEY.format(scope=self.scope, identity=identity_hash)
+
+    async def hit(self, redis_client: redis.asyncio.Redis, identity: str) -> float:
+        """
+        :param redis_client: async redis client
+        :param identity: who is limited
+        :return: 0 if hit is allowed, otherwise seconds to wait
+        """
+        if getattr(self._script, "registered_client", None) is not redis_client:
+            self._script = redis_client.register_script(HIT_SCRIPT)
+        now_ms = int(time.time() * 1000)
+        retry_after_ms = await self._script(
+            keys=[self._key(identity)],
+            args=[
+                now_ms,
+                self._window_ms,
+                self._limit,
+                f"{now_ms}:{secrets.token_hex(4)}",
+            ],
+        )
+        return retry_after_ms / 1000
+
+    async def check(self, redis_client: redis.asyncio.Redis, identity: str) -> None:
+        """
+        :raise: fastapi HTTPException with code 429(too many requests) and Retry-After
+        """
+        if retry_after := await self.hit(redis_client, identity):
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+
+def _client_ip(request: Request) -> str:
+    # behind a proxy run uvicorn with --proxy-headers --forwarded-allow-ips
+    return request.client.host if request.client else "unknown"
+
+
+def limit_by_ip(limiter: SlidingWindowLimiter) -> Callable:
+    """
+    build route dependency limiting requests per client ip
+    usage: @router.get("/path", dependencies=[Depends(limit_by_ip(limiter))])
+    """
+
+    async def dependency(
+        request: Request,
+        redis_client: redis.asyncio.Redis = Depends(get_async_redis_dependency),
+    ) -> None:
+        await limiter.check(redis_client, _client_ip(request))
+
+    return dependency
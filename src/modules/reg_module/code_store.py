@@ -0,0 +1,173 @@
+import enum
+import hashlib
+import hmac
+import secrets
+import time
+
+import redis.asyncio
+
+from src.core.config import load_config
+
+config = load_config()
+
+CODE_KEY = "auth:code:{email_hash}"
+
+# KEYS[1] code key, ARGV[1] code hash, ARGV[2] ttl seconds,
+# ARGV[3] resend cooldown ms, ARGV[4] now ms
+# returns 0 when code is saved, otherwise ms left of resend cooldown
+# (previous code is kept), keys without sent_at are replaced
+SAVE_SCRIPT = """
+local sent_at = tonumber(redis.call('HGET', KEYS[1], 'sent_at') or '0')
+local wait = sent_at + tonumber(ARGV[3]) - tonumber(ARGV[4])
+if wait > 0 then
+    return wait
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'code', ARGV[1], 'attempts', 0, 'sent_at', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 0
+"""
+
+# KEYS[1] code key, ARGV[1] code hash
+# deletes the code only if it is still the given one, returns 1 if deleted
+DISCARD_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'code') == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# KEYS[1] code key, ARGV[1] code hash, ARGV[2] max attempts
+# returns 1 ok (code deleted), 0 wrong, -1 expired/missing, -2 locked
+VERIFY_SCRIPT = """
+local stored = redis.call('HMGET', KEYS[1], 'code', 'attempts')
+if not stored[1] then
+    return -1
+end
+local max_attempts = tonumber(ARGV[2])
+if tonumber(stored[2] or '0') >= max_attempts then
+    return -2
+end
+if stored[1] == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= max_attempts then
+    return -2
+end
+return 0
+"""
+
+
+def create_verification_code() -> str:
+    """
+    :return: random 6-digits code
+    """
+    return str(100_000 + secrets.randbelow(900_000))
+
+
+class CodeCheckResult(enum.Enum):
+    ok = 1
+    wrong = 0
+    expired = -1
+    locked = -2
+
+
+class VerificationCodeStore:
+    """
+    verification codes in redis under namespaced keys, only code hashes are stored
+
+    code check is one lua call: compare, delete on success, count failed
+    attempts and lock the code after max_attempts failures (until it expires)
+    """
+
+    def __init__(self, ttl: int, max_attempts: int, secret: str, resend_cooldown: int):
+        self._ttl = ttl
+        self._resend_cooldown_ms = resend_cooldown * 1000
+        self._max_attempts = max_attempts
+        self._secret = secret.encode("utf-8")
+        self._save_script = None
+        self._discard_script = None
+        self._verify_script = None
+
+    @staticmethod
+    def _key(email: str) -> str:
+        email_hash = hashlib.sha256(email.lower().encode("utf-8")).hexdigest()
+        return CODE_KEY.format(email_hash=email_hash)
+
+    def _hash_code(self, email: str, code: str) -> str:
+        message = f"{email.lower()}:{code}".encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def _register_scripts(self, redis_client: redis.asyncio.Redis) -> None:
+        if getattr(self._verify_script, "registered_client", None) is not redis_client:
+            self._save_script = redis_client.register_script(SAVE_SCRIPT)
+            self._discard_script = redis_client.register_script(DISCARD_SCRIPT)
+            self._verify_script = redis_client.register_script(VERIFY_SCRIPT)
+
+    async def save(
+        self, redis_client: redis.asyncio.Redis, email: str, code: str
+    ) -> float:
+        """
+        store code hash with fresh attempts counter, one round trip,
+        previous code is replaced only after resend cooldown (shorter than ttl,
+        so a lost email doesn't block login until the code expires)
+        :param redis_client: async redis client
+        :param email: user email
+        :param code: plain verification code
+        :return: 0 if code is saved, otherwise seconds left of resend cooldown
+        """
+        self._register_scripts(redis_client)
+        wait_ms = await self._save_script(
+            keys=[self._key(email)],
+            args=[
+                self._hash_code(email, code),
+                self._ttl,
+                self._resend_cooldown_ms,
+                int(time.time() * 1000),
+            ],
+        )
+        return wait_ms / 1000
+
+    async def discard(
+        self, redis_client: redis.asyncio.Redis, email: str, code: str
+    ) -> bool:
+        """
+        drop saved code (with its resend cooldown) when it was never sent,
+        a newer code of the same email is kept
+        :param redis_client: async redis client
+        :param email: user email
+        :param code: plain verification code given to save
+        :return: True if code was deleted
+        """
+        self._register_scripts(redis_client)
+        return bool(
+            await self._discard_script(
+                keys=[self._key(email)], args=[self._hash_code(email, code)]
+            )
+        )
+
+    async def verify(
+        self, redis_client: redis.asyncio.Redis, email: str, code: str
+    ) -> CodeCheckResult:
+        """
+        check code, deletes it on success
+        :param redis_client: async redis client
+        :param email: user email
+        :param code: code entered by user
+        :return: check result
+        """
+        self._register_scripts(redis_client)
+        result = await self._verify_script(
+            keys=[self._key(email)],
+            args=[self._hash_code(email, code), self._max_attempts],
+        )
+        return CodeCheckResult(result)
+
+
+code_store = VerificationCodeStore(
+    ttl=config.verification_code_time_expiration,
+    max_attempts=config.verification_code_max_attempts,
+    secret=config.verification_code_secret,
+    resend_cooldown=config.verification_code_resend_cooldown_seconds,
+)
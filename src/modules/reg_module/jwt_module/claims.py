@@ -0,0 +1,91 @@
+"""
+access token claims profiles
+
+full (no "v" claim):
+    sub, email, role (name), scope, exp, iat, <token_type_field> ("access_token")
+compact, v=1:
+    v, sub, r (role id), s (scope, optional), e (email, optional), exp, iat, t ("a")
+
+scope is the space separated permission names of the role at issue time,
+tokens issued before scopes were added have none (empty scope)
+
+tokens are decoded into the full shape by normalize_claims, so every
+validator works with one shape and both profiles are accepted during rollout
+"""
+
+from typing import Mapping
+
+import jwt
+
+from ...shared.jwt_schemas import TokenType
+
+COMPACT_VERSION = 1
+# rows seeded into roles table by database/migrations.py, used by verifiers
+# running without role catalog (the service itself passes role_catalog maps)
+DEFAULT_ROLE_IDS = {"user": 1, "guest": 2}
+DEFAULT_ROLE_NAMES = {role_id: name for name, role_id in DEFAULT_ROLE_IDS.items()}
+COMPACT_TOKEN_TYPES = {"a": TokenType.access_token.value}
+FULL_TOKEN_TYPES = {value: short for short, value in COMPACT_TOKEN_TYPES.items()}
+
+
+def compact_claims(
+    payload: dict,
+    token_type_field: str,
+    include_email: bool = True,
+    role_ids: Mapping[str, int] = DEFAULT_ROLE_IDS,
+) -> dict:
+    """
+    convert full access token payload to compact profile
+    :param payload: payload built by creator.create_access_token
+    :param token_type_field: name of token type claim in full profile
+    :param include_email: keep email (as "e") in token
+    :param role_ids: role name -> role id
+    :return: compact payload
+    """
+    compact = {
+        "v": COMPACT_VERSION,
+        "sub": payload["sub"],
+        "r": role_ids[payload["role"]],
+        "exp": payload["exp"],
+        "iat": payload["iat"],
+        "t": FULL_TOKEN_TYPES[payload[token_type_field]],
+    }
+    if payload.get("scope"):
+        compact["s"] = payload["scope"]
+    if include_email and payload.get("email") is not None:
+        compact["e"] = payload["email"]
+    return compact
+
+
+def normalize_claims(
+    payload: dict,
+    token_type_field: str,
+    role_names: Mapping[int, str] = DEFAULT_ROLE_NAMES,
+) -> dict:
+    """
+    expand compact payload to full profile, full payloads are returned as is
+    :param payload: verified token payload
+    :param token_type_field: name of token type claim in full profile
+    :param role_names: role id -> role name
+    :return: payload in full profile (email is missing if token has none)
+    :raise: jwt.InvalidTokenError if version, role or type is unknown
+    """
+    version = payload.get("v")
+    if version is None:
+        return payload
+    if version != COMPACT_VERSION:
+        raise jwt.InvalidTokenError(f"Unsupported claims version {version!r}")
+    try:
+        full = {
+            "sub": payload["sub"],
+            "role": role_names[payload["r"]],
+            "scope": payload.get("s", ""),
+            "exp": payload["exp"],
+            "iat": payload["iat"],
+            token_type_field: COMPACT_TOKEN_TYPES[payload["t"]],
+        }
+    except KeyError as e:
+        raise jwt.InvalidTokenError(f"Invalid compact claim {e}") from e
+    if "e" in payload:
+        full["email"] = payload["e"]
+    return full
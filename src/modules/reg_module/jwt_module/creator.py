@@ -1,45 +1,57 @@
 import datetime
-
-import jwt
+import uuid
 
 from src.core.config import load_config
+from src.core.metrics import TOKEN_CREATE_SECONDS, timed
 from src.database.models import User
+from src.services.role_catalog import role_catalog
 
 from ...shared import jwt_schemas
+from .claims import compact_claims
+from .key_manager import get_key_manager
 
 config = load_config()
 
 
+@timed(TOKEN_CREATE_SECONDS, token_type="access_token")
 def create_access_token(
     user: User,
     role: str,
 ) -> str:
     """
     function creates access token using user payload
-    :param role:
+    :param role: role name, its scopes are taken from role_catalog
     :param user: user schema, not orm model
     :return: signed jwt access token(with use payload)
+    :raise: KeyError if role is not in role_catalog
     """
     now = datetime.datetime.now(datetime.UTC)
     jwt_payload = {
         "sub": str(user.id),
         "email": user.email,
         "role": role,
+        "scope": role_catalog.by_name(role).scope,
         "exp": now + datetime.timedelta(minutes=config.jwt.access_token_expire_minutes),
         "iat": now,
         config.jwt.token_type_field: jwt_schemas.TokenType.access_token.value,
     }
-    return jwt.encode(
-        payload=jwt_payload,
-        key=config.jwt.private_key_path,
-        algorithm=config.jwt.algorithm,
-    )
+    if config.jwt.claims_profile == "compact":
+        jwt_payload = compact_claims(
+            jwt_payload,
+            config.jwt.token_type_field,
+            include_email=config.jwt.compact_claims_email,
+            role_ids=role_catalog.role_ids,
+        )
+    return get_key_manager().sign(jwt_payload)
 
 
-def create_refresh_token(user_id: int) -> str:
+@timed(TOKEN_CREATE_SECONDS, token_type="refresh_token")
+def create_refresh_token(user_id: int, family: str | None = None) -> str:
     """
     function update access token using user id
     :param user_id: uses for jwt sub
+    :param family: id shared by refresh tokens rotated from one login,
+        new family is started when None
     :return: signed refresh jwt token
     """
     now = datetime.datetime.now(datetime.UTC)
@@ -47,9 +59,7 @@ def create_refresh_token(user_id: int) -> str:
         "sub": str(user_id),
         config.jwt.token_type_field: jwt_schemas.TokenType.refresh_token.value,
         "exp": now + datetime.timedelta(days=config.jwt.refresh_token_expire_days),
+        "jti": uuid.uuid4().hex,
+        "fam": family or uuid.uuid4().hex,
     }
-    return jwt.encode(
-        payload=jwt_payload,
-        key=config.jwt.private_key_path,
-        algorithm=config.jwt.algorithm,
-    )
+    return get_key_manager().sign(jwt_payload)
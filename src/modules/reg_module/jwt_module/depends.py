@@ -5,18 +5,60 @@ import jwt
 from fastapi import Depends, HTTPException, Request, status
 
 from src.core.config import load_config
-from src.services.user_services import UserService
+from src.core.metrics import AUTH_REJECTIONS
+from src.modules.quota.quota_store import quota_store
+from src.services.role_catalog import GUEST_ROLE, role_catalog
 
 from ...shared import jwt_schemas
 from .. import schemas
+from .claims import normalize_claims
+from .key_manager import get_key_manager
+from .revocation import TOKEN, revocation_store
+from .token_cache import TokenCache
 
 config = load_config()
+token_cache = TokenCache(
+    max_size=config.jwt.token_cache_size,
+    negative_ttl=config.jwt.token_cache_negative_ttl_seconds,
+)
+# rotated or removed keys must not keep serving cached payloads
+get_key_manager().add_reload_listener(token_cache.clear)
+# cached payloads hold role names resolved from compact role ids
+role_catalog.add_reload_listener(token_cache.clear)
 
 
-async def validate_access_token_payload(payload: dict) -> None:
+def _reject(status_code: int, detail: str) -> HTTPException:
     """
-    payload.get unnecessary, because jwt.decode guarantee that payload will be filled
-    function validating access token payload
+    count rejection in AUTH_REJECTIONS (detail is the reason label,
+    so it must stay a constant string)
+    :return: exception to raise
+    """
+    AUTH_REJECTIONS.labels(status_code, detail).inc()
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    verify access token signature, repeated tokens are served from token_cache
+    :param token: jwt access token
+    :return: token payload in full claims profile
+    :raise: jwt.InvalidTokenError if token sign is wrong or token expired
+    """
+    return token_cache.decode(token, _verify_access_token)
+
+
+def _verify_access_token(token: str) -> dict:
+    # compact payloads are expanded before caching, cache hits cost nothing extra
+    return normalize_claims(
+        get_key_manager().verify(token),
+        config.jwt.token_type_field,
+        role_names=role_catalog.role_names,
+    )
+
+
+def validate_access_token_claims(payload: dict) -> None:
+    """
+    stateless part of validate_access_token_payload
     validate:
         date (token expiration date)
         token type (token type must be access)
@@ -27,23 +69,35 @@ async def validate_access_token_payload(payload: dict) -> None:
     """
     # validate token_type
     if payload[config.jwt.token_type_field] != jwt_schemas.TokenType.access_token.value:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token type"
-        )
+        raise _reject(status.HTTP_403_FORBIDDEN, "Invalid token type")
     # check expired date
     if datetime.datetime.now(datetime.UTC) > datetime.datetime.fromtimestamp(
         payload["exp"], datetime.UTC
     ):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired"
-        )
+        raise _reject(status.HTTP_401_UNAUTHORIZED, "Token has expired")
+
+
+async def validate_access_token_payload(payload: dict) -> None:
+    """
+    payload.get unnecessary, because jwt.decode guarantee that payload will be filled
+    function validating access token payload
+    validate:
+        date (token expiration date)
+        token type (token type must be access)
+        free requests left (only for guests)
+
+    :param payload: dict with user information (all params in creator.py:create_access_token)
+    :return: None
+    :raise: fastapi HTTPException with code 401(unauthorized)
+    """
+    validate_access_token_claims(payload)
     # check free requests for un-auth user
-    if payload["role"] == "guest":
-        user_reqs = await UserService.get_user_reqs_count(user_id=int(payload["sub"]))
-        if user_reqs >= 20:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Your free requests are over, you need to register a full account",
+    if payload["role"] == GUEST_ROLE:
+        user_reqs = await quota_store.peek(user_id=int(payload["sub"]))
+        if user_reqs >= quota_store.limit:
+            raise _reject(
+                status.HTTP_403_FORBIDDEN,
+                "Your free requests are over, you need to register a full account",
             )
 
 
@@ -60,39 +114,74 @@ def _get_refresh_token_from_cookies(
     """
     cookie = request.cookies
     if not (token := cookie.get(jwt_schemas.TokenType.refresh_token.value)):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token not found, re-login please!",
-        )
+        raise _reject(status.HTTP_401_UNAUTHORIZED, "Token not found, re-login please!")
     return token
 
 
-def get_user_id_from_refresh_token(
+async def get_refresh_token_payload(
     refresh_token: str = Depends(_get_refresh_token_from_cookies),
-) -> int:
+) -> dict:
     """
-    extract user id from refresh jwt token
-    to make new access token
+    verify refresh jwt token and check that it is not revoked
+    (redis is asked only when revocation bloom filter reports possible match)
     :param refresh_token: jwt token
-    :return:int: user_id
+    :return: refresh token payload
     :raise: fastapi HTTPException with code 401(unauthorized) if token sign is wrong
     :raise: fastapi HTTPException with code 401(unauthorized) if token expired
+    :raise: fastapi HTTPException with code 401(unauthorized) if token is revoked
     """
     try:
-        payload: dict = jwt.decode(
-            refresh_token, config.jwt.public_key_path, algorithms=[config.jwt.algorithm]
-        )
+        payload: dict = get_key_manager().verify(refresh_token)
     except jwt.InvalidTokenError as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
-        ) from e
+        raise _reject(status.HTTP_401_UNAUTHORIZED, "Invalid refresh token") from e
+    if (
+        payload.get(config.jwt.token_type_field)
+        != jwt_schemas.TokenType.refresh_token.value
+    ):
+        raise _reject(status.HTTP_401_UNAUTHORIZED, "Invalid token type")
     # check expired date
     if datetime.datetime.now(datetime.UTC) > datetime.datetime.fromtimestamp(
         payload["exp"], datetime.UTC
     ):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired"
-        )
+        raise _reject(status.HTTP_401_UNAUTHORIZED, "Token has expired")
+    # tokens issued before jti was added can't be revoked
+    if "jti" in payload and (
+        revoked := await revocation_store.revoked_kind(payload["jti"], payload["fam"])
+    ):
+        if revoked == TOKEN:
+            # rotated token is used again: it was stolen, or the thief
+            # has already rotated it, so the whole login is revoked
+            await revocation_store.revoke_family(payload["fam"])
+            logging.warning(f"Refresh token reuse detected, user {payload['sub']}")
+        raise _reject(status.HTTP_401_UNAUTHORIZED, "Token has been revoked")
+    return payload
+
+
+def read_refresh_token_payload(request: Request) -> dict | None:
+    """
+    payload of refresh token from cookies without any checks except signature,
+    used where missing or bad token is not an error (logout)
+    :param request: base fastapi request
+    :return: refresh token payload or None
+    """
+    token = request.cookies.get(jwt_schemas.TokenType.refresh_token.value)
+    if not token:
+        return None
+    try:
+        return get_key_manager().verify(token)
+    except jwt.InvalidTokenError:
+        return None
+
+
+async def get_user_id_from_refresh_token(
+    payload: dict = Depends(get_refresh_token_payload),
+) -> int:
+    """
+    extract user id from refresh jwt token
+    to make new access token
+    :param payload: verified refresh token payload
+    :return:int: user_id
+    """
     return int(payload["sub"])
 
 
@@ -105,9 +194,7 @@ def _get_access_token_from_cookie(request: Request) -> str:
     """
     cookie = request.cookies
     if not (token := cookie.get(jwt_schemas.TokenType.access_token.value)):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token not found"
-        )
+        raise _reject(status.HTTP_401_UNAUTHORIZED, "Token not found")
     return token
 
 
@@ -117,9 +204,7 @@ def _get_access_token_from_headers(
     headers = request.headers
     if headers.get("Authorization"):
         return headers.get("Authorization").split(" ")[-1]
-    raise HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED, detail="Token required"
-    )
+    raise _reject(status.HTTP_401_UNAUTHORIZED, "Token required")
 
 
 async def get_user_from_token(
@@ -132,18 +217,54 @@ async def get_user_from_token(
     :raise: fastapi HTTPException with code 401(unauthorized) if token sign is wrong
     """
     try:
-        payload: dict = jwt.decode(
-            token, config.jwt.public_key_path, algorithms=[config.jwt.algorithm]
-        )
+        payload: dict = decode_access_token(token)
     except jwt.InvalidTokenError as e:
         logging.exception("invalid token")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-        ) from e
+        raise _reject(status.HTTP_401_UNAUTHORIZED, "Invalid token") from e
     await validate_access_token_payload(payload)
     return schemas.User(
         id=payload["sub"],
-        email=payload["email"],
-        role=payload.get("role", "guest"),
+        # compact tokens may be issued without email
+        email=payload.get("email"),
+        role=payload.get("role", GUEST_ROLE),
+        scopes=payload.get("scope", "").split(),
     )
+
+
+async def consume_quota(
+    user: schemas.User = Depends(get_user_from_token),
+) -> schemas.User:
+    """
+    spend one free request of guest user, use as route dependency
+    for handlers that cost a request, registered users are not limited
+    :param user: user from access token
+    :return: user schema
+    :raise: fastapi HTTPException with code 403(forbidden) if free requests are over
+    """
+    if user.role == GUEST_ROLE:
+        result = await quota_store.consume(user.id)
+        if not result.allowed:
+            raise _reject(
+                status.HTTP_403_FORBIDDEN,
+                "Your free requests are over, you need to register a full account",
+            )
+    return user
+
+
+def require_scope(scope: str):
+    """
+    route dependency factory, scopes come from access token (no db lookup)
+    usage: Depends(require_scope("profile:read"))
+    :param scope: permission name the user role must have
+    :return: dependency returning user schema
+    :raise: fastapi HTTPException with code 403(forbidden) if scope is missing
+    """
+
+    async def dependency(
+        user: schemas.User = Depends(get_user_from_token),
+    ) -> schemas.User:
+        if scope not in user.scopes:
+            raise _reject(status.HTTP_403_FORBIDDEN, "Missing scope")
+        return user
+
+    return dependency
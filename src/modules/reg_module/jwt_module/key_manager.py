@@ -0,0 +1,258 @@
+import asyncio
+import functools
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed448, ed25519, rsa
+from cryptography.hazmat.primitives.asymmetric.types import (
+    PrivateKeyTypes,
+    PublicKeyTypes,
+)
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+
+from src.core.config import load_config
+from src.core.metrics import JWT_DECODE_SECONDS
+from src.core.startup import startup_report
+
+logger = logging.getLogger(__name__)
+
+PRIVATE_KEY_SUFFIX = "-private.pem"
+PUBLIC_KEY_SUFFIX = "-public.pem"
+# optional file in keys_dir, overrides configured active kid on (re)load
+ACTIVE_KID_FILE = "active_kid"
+
+EC_CURVE_ALGORITHMS = {
+    "secp256r1": "ES256",
+    "secp384r1": "ES384",
+    "secp521r1": "ES512",
+}
+
+
+def algorithm_for_key(public_key: PublicKeyTypes) -> str:
+    """
+    jwt algorithm is taken from key type, so every kid has its own algorithm
+    :param public_key: parsed public key
+    :return: RS256 for rsa, ES256/ES384/ES512 for ec, EdDSA for ed25519/ed448
+    :raise: Exception if key type is not supported
+    """
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, (ed25519.Ed25519PublicKey, ed448.Ed448PublicKey)):
+        return "EdDSA"
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        if algorithm := EC_CURVE_ALGORITHMS.get(public_key.curve.name):
+            return algorithm
+        raise Exception(f"KeyManager: unsupported ec curve {public_key.curve.name}")
+    raise Exception(f"KeyManager: unsupported key type {type(public_key).__name__}")
+
+
+@dataclass(frozen=True)
+class JWTKey:
+    """
+    parsed key pair, private_key is None for verify-only (retired) keys
+    """
+
+    kid: str
+    algorithm: str
+    public_key: PublicKeyTypes
+    private_key: PrivateKeyTypes | None = None
+
+
+class KeyManager:
+    """
+    holds parsed cryptography key objects identified by kid
+
+    keys are read from keys_dir once, files are named <kid>-private.pem and
+    <kid>-public.pem (public part is derived from private key when missing).
+    algorithm is chosen per key by its type (rsa, ec or ed25519), so RS256
+    tokens keep verifying while new ones are signed with EdDSA/ES256.
+    tokens are signed with active kid and verified with the key named in
+    their "kid" header, tokens without kid (issued before keys had ids) are
+    verified with the configured kid, never with the runtime active one.
+    to rotate: put new pair in keys_dir, wait for every process to reload it,
+    write new kid to keys_dir/active_kid, keep the old public key until all
+    tokens signed with it are expired
+    """
+
+    def __init__(self, keys_dir: Path, active_kid: str):
+        self._keys_dir = keys_dir
+        self._default_kid = active_kid
+        # (keys by kid, active kid) swapped as one object on reload
+        self._state: tuple[dict[str, JWTKey], str] = ({}, active_kid)
+        self._fingerprint: tuple = ()
+        self._lock = threading.Lock()
+        self._reload_listeners: list[Callable[[], None]] = []
+        self.reload()
+
+    def _scan(self) -> tuple:
+        paths = [*self._keys_dir.glob("*.pem"), *self._keys_dir.glob(ACTIVE_KID_FILE)]
+        return tuple(
+            sorted(
+                (path.name, path.stat().st_mtime_ns, path.stat().st_size)
+                for path in paths
+            )
+        )
+
+    def _read_active_kid(self) -> str:
+        path = self._keys_dir / ACTIVE_KID_FILE
+        if path.exists():
+            return path.read_text().strip()
+        return self._default_kid
+
+    def _load_keys(self) -> dict[str, JWTKey]:
+        private_keys: dict[str, PrivateKeyTypes] = {}
+        public_keys: dict[str, PublicKeyTypes] = {}
+        for path in self._keys_dir.glob("*.pem"):
+            if path.name.endswith(PRIVATE_KEY_SUFFIX):
+                kid = path.name.removesuffix(PRIVATE_KEY_SUFFIX)
+                private_keys[kid] = load_pem_private_key(
+                    path.read_bytes(), password=None
+                )
+            elif path.name.endswith(PUBLIC_KEY_SUFFIX):
+                kid = path.name.removesuffix(PUBLIC_KEY_SUFFIX)
+                public_keys[kid] = load_pem_public_key(path.read_bytes())
+        keys = {}
+        for kid in private_keys.keys() | public_keys.keys():
+            private_key = private_keys.get(kid)
+            public_key = public_keys.get(kid) or private_key.public_key()
+            keys[kid] = JWTKey(
+                kid=kid,
+                algorithm=algorithm_for_key(public_key),
+                public_key=public_key,
+                private_key=private_key,
+            )
+        return keys
+
+    def reload(self) -> None:
+        """
+        re-read keys_dir and swap key set atomically
+        :raise: Exception on first load if active key is missing or broken,
+            on later reloads previous keys are kept and error is logged
+        """
+        fingerprint = self._scan()
+        try:
+            keys = self._load_keys()
+            active_kid = self._read_active_kid()
+            if keys.get(active_kid) is None or keys[active_kid].private_key is None:
+                raise Exception(
+                    f"KeyManager: private key for active kid {active_kid!r}"
+                    f" not found in {self._keys_dir}"
+                )
+        except Exception:
+            if not self._state[0]:
+                raise
+            logger.exception("JWT keys reload failed, keeping previous keys")
+            return
+        with self._lock:
+            self._state = (keys, active_kid)
+            self._fingerprint = fingerprint
+        logger.info(f"JWT keys loaded: {sorted(keys)} (active {active_kid!r})")
+        for listener in self._reload_listeners:
+            listener()
+
+    def reload_if_changed(self) -> bool:
+        """
+        reload keys only when any pem file in keys_dir was added, removed or changed
+        :return: True if keys were reloaded
+        """
+        if self._scan() == self._fingerprint:
+            return False
+        self.reload()
+        return True
+
+    def add_reload_listener(self, listener: Callable[[], None]) -> None:
+        """
+        listener is called after every successful reload (e.g. to drop caches)
+        """
+        self._reload_listeners.append(listener)
+
+    @property
+    def active_key(self) -> JWTKey:
+        keys, active_kid = self._state
+        return keys[active_kid]
+
+    def get_key(self, kid: str | None) -> JWTKey | None:
+        """
+        :param kid: kid from token header, None for tokens issued without it
+        :return: key or None if kid is unknown
+        """
+        # kid-less tokens were signed with the configured key, active_kid file
+        # may already point to another one after rotation
+        return self._state[0].get(kid or self._default_kid)
+
+    def public_keys(self) -> list[JWTKey]:
+        return list(self._state[0].values())
+
+    def jwks(self) -> dict:
+        """
+        public keys as JSON Web Key Set (RFC 7517)
+        """
+        keys = []
+        for key in self.public_keys():
+            jwk = jwt.get_algorithm_by_name(key.algorithm).to_jwk(
+                key.public_key, as_dict=True
+            )
+            keys.append({**jwk, "kid": key.kid, "alg": key.algorithm, "use": "sig"})
+        return {"keys": sorted(keys, key=lambda jwk: jwk["kid"])}
+
+    def sign(self, payload: dict) -> str:
+        """
+        sign payload with active key, kid is put into token header
+        :param payload: jwt claims
+        :return: signed jwt
+        """
+        key = self.active_key
+        return jwt.encode(
+            payload=payload,
+            key=key.private_key,
+            algorithm=key.algorithm,
+            headers={"kid": key.kid},
+        )
+
+    def verify(self, token: str) -> dict:
+        """
+        verify token with the key named in its kid header
+        :param token: signed jwt
+        :return: token payload
+        :raise: jwt.InvalidTokenError if kid is unknown or token is invalid
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.get_key(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown key id {kid!r}")
+        with JWT_DECODE_SECONDS.time():
+            return jwt.decode(token, key.public_key, algorithms=[key.algorithm])
+
+
+@functools.cache
+def get_key_manager() -> KeyManager:
+    """
+    process wide key manager, keys are parsed on first use only
+    """
+    config = load_config()
+    with startup_report.phase("jwt_keys"):
+        return KeyManager(
+            keys_dir=Path(config.jwt.keys_dir),
+            active_kid=config.jwt.active_kid,
+        )
+
+
+async def watch_keys(interval: float) -> None:
+    """
+    background task, reloads keys when files in keys_dir change
+    :param interval: seconds between keys_dir checks
+    """
+    manager = get_key_manager()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(manager.reload_if_changed)
+        except Exception:
+            logger.exception("JWT keys watcher failed")
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+
+from src.core.config import load_config
+from src.core.pubsub import add_subscribe_listener, publish, subscribe
+from src.core.redis_initializer import get_async_redis
+
+logger = logging.getLogger(__name__)
+config = load_config()
+
+REVOKED_PREFIX = "auth:revoked:"
+REVOKED_KEY = REVOKED_PREFIX + "{kind}:{value}"
+REVOKED_CHANNEL = "auth:revoked"
+TOKEN = "jti"
+FAMILY = "fam"
+
+
+class BloomFilter:
+    """
+    probabilistic set: might_contain never misses added items,
+    returns false positives with about error_rate probability
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self._size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self._hashes):
+            yield (first + i * second) % self._size
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationStore:
+    """
+    revoked refresh tokens (by jti) and token families (by fam) in redis,
+    every process keeps a bloom filter of revoked ids, synced by pub/sub,
+    so redis is asked only when the filter reports a possible match
+    (or for every check until the first rebuild has loaded the filter)
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        # filter being filled by rebuild, gets live revocations too
+        self._next_filter: BloomFilter | None = None
+        self._loaded = False
+        self._rebuild_lock = asyncio.Lock()
+        self._rebuild_task: asyncio.Task | None = None
+
+    @staticmethod
+    def _key(kind: str, value: str) -> str:
+        return REVOKED_KEY.format(kind=kind, value=value)
+
+    def _on_revoked(self, message: str) -> None:
+        self._filter.add(message)
+        if self._next_filter is not None:
+            self._next_filter.add(message)
+
+    async def _revoke(self, kind: str, value: str, ttl: int) -> bool:
+        claimed = await get_async_redis().set(
+            self._key(kind, value), 1, nx=True, ex=max(ttl, 1)
+        )
+        self._on_revoked(f"{kind}:{value}")
+        await publish(REVOKED_CHANNEL, f"{kind}:{value}")
+        return bool(claimed)
+
+    async def revoke_token(self, jti: str, exp: int) -> bool:
+        """
+        revoke one refresh token until its expiration
+        :param jti: token id
+        :param exp: token exp (unix time)
+        :return: False if token was already revoked (used)
+        """
+        return await self._revoke(TOKEN, jti, int(exp - time.time()))
+
+    async def revoke_family(self, family: str) -> None:
+        """
+        revoke every refresh token issued by rotation from one login
+        """
+        await self._revoke(
+            FAMILY, family, config.jwt.refresh_token_expire_days * 24 * 60 * 60
+        )
+
+    async def revoked_kind(self, jti: str, family: str) -> str | None:
+        """
+        :param jti: refresh token id
+        :param family: refresh token family id
+        :return: FAMILY if family is revoked, TOKEN if only token is revoked
+            (already used), None if token is valid
+        """
+        candidates = [
+            (kind, value)
+            for kind, value in ((FAMILY, family), (TOKEN, jti))
+            # empty filter would accept revoked tokens
+            if not self._loaded or self._filter.might_contain(f"{kind}:{value}")
+        ]
+        if not candidates:
+            return None
+        found = await get_async_redis().mget(
+            [self._key(kind, value) for kind, value in candidates]
+        )
+        for (kind, _), value in zip(candidates, found, strict=True):
+            if value is not None:
+                return kind
+        return None
+
+    async def rebuild(self) -> None:
+        """
+        fill a new filter from redis, expired revocations are dropped this way
+        """
+        async with self._rebuild_lock:
+            self._next_filter = BloomFilter(self._capacity, self._error_rate)
+            try:
+                async for key in get_async_redis().scan_iter(
+                    match=f"{REVOKED_PREFIX}*", count=1000
+                ):
+                    self._next_filter.add(key.removeprefix(REVOKED_PREFIX))
+                self._filter = self._next_filter
+                self._loaded = True
+            finally:
+                self._next_filter = None
+
+    def schedule_rebuild(self) -> None:
+        """
+        rebuild in background, e.g. after pub/sub reconnect
+        (revocations published while disconnected are only in redis)
+        """
+        if self._rebuild_task is None or self._rebuild_task.done():
+            self._rebuild_task = asyncio.create_task(self._rebuild_logged())
+
+    async def _rebuild_logged(self) -> None:
+        try:
+            await self.rebuild()
+        except Exception:
+            logger.exception("Revocation filter rebuild failed")
+
+
+revocation_store = RevocationStore(
+    capacity=config.revocation.bloom_capacity,
+    error_rate=config.revocation.bloom_error_rate,
+)
+subscribe(REVOKED_CHANNEL, revocation_store._on_revoked)
+add_subscribe_listener(revocation_store.schedule_rebuild)
+
+
+async def run_revocation_sync(
+    interval: float, retry_delay: float = 1.0, max_retry_delay: float = 60.0
+) -> None:
+    """
+    background task, rebuilds filter periodically (first rebuild is done
+    at startup), failed rebuilds are retried with exponential backoff
+    :param interval: seconds between successful rebuilds
+    :param retry_delay: seconds before first retry after failure
+    :param max_retry_delay: backoff limit
+    """
+    failures = 0
+    while True:
+        await asyncio.sleep(
+            min(retry_delay * 2 ** (failures - 1), max_retry_delay)
+            if failures
+            else interval
+        )
+        try:
+            await revocation_store.rebuild()
+            failures = 0
+        except Exception:
+            failures += 1
+            logger.exception("Revocation filter rebuild failed")
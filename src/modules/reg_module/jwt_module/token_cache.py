@@ -0,0 +1,87 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+
+import jwt
+
+from src.core.metrics import TOKEN_CACHE_ENTRIES, TOKEN_CACHE_LOOKUPS
+
+_HITS = TOKEN_CACHE_LOOKUPS.labels("hit")
+_MISSES = TOKEN_CACHE_LOOKUPS.labels("miss")
+
+
+class _Entry(NamedTuple):
+    expires_at: float
+    payload: dict | None
+    error: str | None
+
+
+class TokenCache:
+    """
+    bounded LRU of already verified tokens, keyed by sha256 of the token
+
+    valid tokens are kept with their decoded payload until the token "exp",
+    tokens that failed verification are kept for negative_ttl seconds,
+    so repeated garbage tokens don't cost a signature check each time.
+    hits, misses and size are exported to /metrics (auth_token_cache_*)
+    """
+
+    def __init__(self, max_size: int, negative_ttl: float):
+        self._max_size = max_size
+        self._negative_ttl = negative_ttl
+        self._entries: OrderedDict[bytes, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def _put(self, key: bytes, entry: _Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+            TOKEN_CACHE_ENTRIES.set(len(self._entries))
+
+    def decode(self, token: str, decoder: Callable[[str], dict]) -> dict:
+        """
+        return cached payload or verify token with decoder and cache the result
+        :param token: jwt token
+        :param decoder: function doing the real signature check (jwt.decode)
+        :return: decoded payload (copy, safe to change)
+        :raise: jwt.InvalidTokenError if token is invalid (cached or fresh)
+        """
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                TOKEN_CACHE_ENTRIES.set(len(self._entries))
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            _HITS.inc()
+            if entry.error is not None:
+                raise jwt.InvalidTokenError(entry.error)
+            return dict(entry.payload)
+
+        _MISSES.inc()
+        try:
+            payload = decoder(token)
+        except jwt.InvalidTokenError as e:
+            self._put(key, _Entry(now + self._negative_ttl, None, str(e)))
+            raise
+        # tokens without exp are never cached, they would live forever
+        if isinstance(payload.get("exp"), (int, float)):
+            self._put(key, _Entry(payload["exp"], payload, None))
+        return dict(payload)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            TOKEN_CACHE_ENTRIES.set(0)
@@ -1,35 +1,107 @@
-import hmac
 import logging
+import time
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
-from redis import Redis
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from redis.asyncio import Redis
 
-from src.core.redis_initializer import get_redis
+from src.core.redis_initializer import get_async_redis_dependency
 
 from ...core.config import load_config
+from ...database.models import User
+from ...services.guest_ids import guest_id_allocator
+from ...services.role_catalog import GUEST_ROLE, USER_ROLE, role_catalog
 from ...services.user_services import UserService
+from ..quota.quota_store import quota_store
+from ..rate_limiter.rate_limiter import SlidingWindowLimiter, limit_by_ip
 from ..shared import jwt_schemas
 from ..shared.jwt_schemas import TokenType
-from ..smtp_celery_sender.send_code_to_user import send_verification_code
+from ..smtp_celery_sender.delivery_stats import get_delivery_latency_stats
+from ..smtp_celery_sender.producer import enqueue_verification_code
 from . import schemas
+from .code_store import CodeCheckResult, code_store, create_verification_code
 from .jwt_module.creator import create_access_token, create_refresh_token
-from .jwt_module.depends import get_user_from_token, get_user_id_from_refresh_token
+from .jwt_module.depends import (
+    get_refresh_token_payload,
+    get_user_from_token,
+    read_refresh_token_payload,
+    require_scope,
+)
+from .jwt_module.revocation import revocation_store
 
 router: APIRouter = APIRouter(prefix="/auth", tags=["auth"])
 config = load_config()
+# permission of operators allowed to read service stats
+STATS_SCOPE = "stats:read"
+
+auth_ip_limiter = SlidingWindowLimiter(
+    "auth:ip", **config.rate_limit.auth_per_ip.model_dump()
+)
+auth_email_limiter = SlidingWindowLimiter(
+    "auth:email", **config.rate_limit.auth_per_email.model_dump()
+)
+guest_ip_limiter = SlidingWindowLimiter(
+    "guest:ip", **config.rate_limit.guest_per_ip.model_dump()
+)
+
+
+async def _role_name(user: User) -> str:
+    """
+    name of user role for access token
+    :raise HTTPException 503 (when role is unknown even after catalog reload)
+    """
+    try:
+        return (await role_catalog.get_by_id(user.role_id)).name
+    except KeyError as e:
+        logging.error(f"User {user.id} has role {user.role_id} missing in catalog")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="User role is not available, try again later",
+        ) from e
+
 
+def _set_refresh_token_cookie(response: Response, refresh_token: str) -> None:
+    response.set_cookie(
+        key=jwt_schemas.TokenType.refresh_token.value,
+        value=refresh_token,
+        httponly=False,  # MAKE TRUE ON PRODUCTION
+        secure=False,  # MAKE TRUE ON PRODUCTION
+    )
 
-@router.post("/auth")
-async def auth_user(email: schemas.EmailForm) -> schemas.SuccessMessageSend:
+
+@router.post("/auth", dependencies=[Depends(limit_by_ip(auth_ip_limiter))])
+async def auth_user(
+    email: schemas.EmailForm,
+    redis_client: Redis = Depends(get_async_redis_dependency),
+) -> schemas.SuccessMessageSend:
     """
     first authorization router, user enter phone number and will receive 6-digits code
+    code is saved before enqueue, so it is valid no matter how long email waits in queue
+    no new email is sent during resend cooldown, code is dropped if enqueue fails
+    so the client can retry at once
     :param email: validated phone number
+    :param redis_client: redis connection
     :return: success message
+    :raise HTTPException with 429(too many requests from ip or for email)
     :raise HTTPException with 500(some gone wrong)
     """
     email = email.email
+    await auth_email_limiter.check(redis_client, email)
     try:
-        send_verification_code.delay(email)
+        code = create_verification_code()
+        if await code_store.save(redis_client, email=email, code=code):
+            return schemas.SuccessMessageSend(
+                message="Verification code already sent",
+            )
+        try:
+            # celery publish is blocking, keep it off the event loop
+            await run_in_threadpool(
+                enqueue_verification_code, email, code, enqueued_at=time.time()
+            )
+        except Exception:
+            # nothing was sent, don't answer "already sent" until cooldown ends
+            await code_store.discard(redis_client, email=email, code=code)
+            raise
         return schemas.SuccessMessageSend(
             message="Verification code sent successfully",
         )
@@ -42,7 +114,7 @@ async def auth_user(email: schemas.EmailForm) -> schemas.SuccessMessageSend:
 async def verify_code(
     response: Response,
     user_auth_info: schemas.UserAuthInfo,
-    redis_client: Redis = Depends(get_redis),
+    redis_client: Redis = Depends(get_async_redis_dependency),
 ):
     """
     second authorization handler, user has received the code, and will enter it to form with code
@@ -53,41 +125,52 @@ async def verify_code(
     :return: None(only set cookies)
     :raise HTTPException 410 (when code not found in redis)
     :raise HTTPException 403 (when code is wrong)
+    :raise HTTPException 429 (when code is locked after too many wrong attempts)
+    :raise HTTPException 503 (when user role is unknown)
     """
-    # get code from redis using phone number
-    backend_code_from_user = redis_client.get(user_auth_info.email)
-    if backend_code_from_user is None:
+    # compare and delete code in one redis call
+    code_check = await code_store.verify(
+        redis_client, email=user_auth_info.email, code=str(user_auth_info.code)
+    )
+    if code_check is CodeCheckResult.expired:
         raise HTTPException(
             status_code=status.HTTP_410_GONE, detail="Code lifetime is expired"
         )
-    # using to avoid time attack
-    if hmac.compare_digest(backend_code_from_user, str(user_auth_info.code)):
-        # delete code from redis
-        redis_client.delete(user_auth_info.email)
+    if code_check is CodeCheckResult.locked:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many wrong attempts, request a new code later",
+        )
+    if code_check is CodeCheckResult.ok:
         # insert or get user from db
-        user_model = await UserService.create_user(user_auth_info.email, role_id=1)
+        user_model = await UserService.upsert_user_by_email(
+            user_auth_info.email, role_id=role_catalog.by_name(USER_ROLE).id
+        )
 
         # user auth success!
-        # create jwt tokens
-        access_token: str = create_access_token(user=user_model, role="user")
+        # create jwt tokens, existing users keep their own role
+        access_token: str = create_access_token(
+            user=user_model, role=await _role_name(user_model)
+        )
         refresh_token: str = create_refresh_token(user_model.id)
 
         # set jwt tokens in cookies
-        response.set_cookie(
-            key=jwt_schemas.TokenType.refresh_token.value,
-            value=refresh_token,
-            httponly=False,  # MAKE TRUE ON PRODUCTION
-            secure=False,  # MAKE TRUE ON PRODUCTION
-        )
+        _set_refresh_token_cookie(response, refresh_token)
         return {TokenType.access_token: access_token}
 
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Wrong code")
 
 
-@router.get("/verify_guest")
+@router.get("/verify_guest", dependencies=[Depends(limit_by_ip(guest_ip_limiter))])
 async def verify_guest() -> schemas.AccessTokenSchema:
-    user = await UserService.create_user(email=None, role_id=2)
-    token = create_access_token(user=user, role="guest")
+    if config.guest.lazy_rows:
+        # no db write, row appears when guest spends its first request
+        user = User(id=await guest_id_allocator.allocate(), email=None)
+    else:
+        user = await UserService.create_user(
+            email=None, role_id=role_catalog.by_name(GUEST_ROLE).id
+        )
+    token = create_access_token(user=user, role=GUEST_ROLE)
 
     return {"access_token": token}
 
@@ -95,18 +178,39 @@ async def verify_guest() -> schemas.AccessTokenSchema:
 @router.get("/refresh_token")
 async def get_new_access_token(
     response: Response,
-    user_id: int = Depends(get_user_id_from_refresh_token),
+    refresh_payload: dict = Depends(get_refresh_token_payload),
 ):
     """
     using to update access token
+    with rotation enabled refresh token is single use: new one is set in cookies,
+    second use of the old one revokes all tokens of this login (token theft)
     :param response:
-    :param user_id: user id from refresh token(token after validation)
+    :param refresh_payload: refresh token payload(token after validation)
     :return: None (set new access token in cookies)
+    :raise HTTPException 401 (when refresh token is reused)
+    :raise HTTPException 503 (when user role is unknown)
     """
+    user_id = int(refresh_payload["sub"])
+    if config.revocation.rotate_refresh_tokens:
+        family = refresh_payload.get("fam")
+        if "jti" in refresh_payload and not await revocation_store.revoke_token(
+            refresh_payload["jti"], refresh_payload["exp"]
+        ):
+            await revocation_store.revoke_family(family)
+            logging.warning(f"Refresh token reuse detected, user {user_id}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+            )
+        _set_refresh_token_cookie(
+            response, create_refresh_token(user_id, family=family)
+        )
     # get user from database
     user_model = await UserService.get_user_by_id(user_id)
     # set jwt
-    access_token = create_access_token(user=user_model, role="user")
+    access_token = create_access_token(
+        user=user_model, role=await _role_name(user_model)
+    )
     return {
         TokenType.access_token: access_token,
     }
@@ -116,17 +220,21 @@ async def get_new_access_token(
 async def get_user_tokens(
     user=Depends(get_user_from_token),
 ) -> schemas.UserRequestsResponse:
-    return {"reqs": await UserService.get_user_reqs_count(user.id)}
+    return {"reqs": await quota_store.peek(user.id)}
 
 
 @router.get("/logout")
-async def logout(response: Response, _=Depends(get_user_from_token)):
+async def logout(request: Request, response: Response, _=Depends(get_user_from_token)):
     """
-    delete user cookies
+    revoke refresh tokens of this login and delete user cookies
+    :param request: base fastapi request
     :param response:
     :param _: uses to check that user logged
     :return: None (delete both tokens cookies)
     """
+    refresh_payload = read_refresh_token_payload(request)
+    if refresh_payload is not None and "fam" in refresh_payload:
+        await revocation_store.revoke_family(refresh_payload["fam"])
     response.delete_cookie(
         key=jwt_schemas.TokenType.refresh_token.value,
     )
@@ -150,3 +258,19 @@ async def get_user_profile(
     user=Depends(get_user_from_token),
 ):
     return user
+
+
+@router.get(
+    "/email_delivery_stats",
+    tags=["Stats"],
+    dependencies=[Depends(require_scope(STATS_SCOPE))],
+)
+async def email_delivery_stats(
+    redis_client: Redis = Depends(get_async_redis_dependency),
+) -> schemas.DeliveryLatencyStats:
+    """
+    enqueue-to-send latency of verification emails (last samples, ms)
+    :raise HTTPException 401 (when access token is missing or invalid)
+    :raise HTTPException 403 (when user role has no stats:read permission)
+    """
+    return await get_delivery_latency_stats(redis_client)
@@ -1,10 +1,14 @@
-from typing import Optional
+from typing import Annotated, Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import AfterValidator, BaseModel, EmailStr
+
+# login email, lowercased once here: code store, rate limiter and
+# users.email (unique, upserted on login) all see the same form
+LoginEmail = Annotated[EmailStr, AfterValidator(str.lower)]
 
 
 class EmailForm(BaseModel):
-    email: EmailStr
+    email: LoginEmail
 
 
 class SuccessMessageSend(BaseModel):
@@ -15,11 +19,13 @@ class User(BaseModel):
     id: int
     email: Optional[EmailStr] = None
     role: str
+    # permission names of the role, from access token
+    scopes: list[str] = []
 
 
 class UserAuthInfo(BaseModel):
     code: str
-    email: EmailStr
+    email: LoginEmail
 
 
 class AccessTokenSchema(BaseModel):
@@ -28,3 +34,11 @@ class AccessTokenSchema(BaseModel):
 
 class UserRequestsResponse(BaseModel):
     reqs: int
+
+
+class DeliveryLatencyStats(BaseModel):
+    count: int
+    p50: float
+    p95: float
+    p99: float
+    max: float
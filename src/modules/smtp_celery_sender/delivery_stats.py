@@ -0,0 +1,49 @@
+import statistics
+
+import redis
+import redis.asyncio
+
+LATENCY_KEY = "smtp:delivery_latency"
+# last samples kept for percentiles
+LATENCY_SAMPLES = 1000
+
+
+def record_delivery_latency(redis_client: redis.Redis, seconds: list[float]) -> None:
+    """
+    save enqueue-to-send latency of delivered emails (called by celery worker)
+    :param redis_client: sync redis client
+    :param seconds: latency of every delivered email
+    """
+    if not seconds:
+        return
+    with redis_client.pipeline(transaction=False) as pipe:
+        pipe.lpush(LATENCY_KEY, *(f"{value:.4f}" for value in seconds))
+        pipe.ltrim(LATENCY_KEY, 0, LATENCY_SAMPLES - 1)
+        pipe.execute()
+
+
+async def get_delivery_latency_stats(redis_client: redis.asyncio.Redis) -> dict:
+    """
+    :param redis_client: async redis client
+    :return: count and p50/p95/p99/max latency in ms over last samples
+    """
+    samples = sorted(
+        float(value) * 1000 for value in await redis_client.lrange(LATENCY_KEY, 0, -1)
+    )
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return {
+            "count": len(samples),
+            "p50": value,
+            "p95": value,
+            "p99": value,
+            "max": value,
+        }
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "count": len(samples),
+        "p50": quantiles[49],
+        "p95": quantiles[94],
+        "p99": quantiles[98],
+        "max": samples[-1],
+    }
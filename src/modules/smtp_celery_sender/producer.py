@@ -0,0 +1,38 @@
+"""
+api side of email delivery: tasks are published by name, so the api process
+doesn't import worker code (task bodies, smtp pool, bcrypt), celery itself
+is imported on first publish instead of app startup
+"""
+
+import functools
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from celery import Celery
+
+SEND_VERIFICATION_CODE_TASK = (
+    "src.modules.smtp_celery_sender.send_code_to_user.send_verification_code"
+)
+
+
+@functools.cache
+def _celery() -> "Celery":
+    from src.core.celery_config import celery
+
+    return celery
+
+
+def enqueue_verification_code(
+    email: str, auth_code: str, enqueued_at: float | None = None
+) -> None:
+    """
+    publish send_verification_code task, blocking (run it in threadpool)
+    :param email: validated user email
+    :param auth_code: verification code, already saved to code store
+    :param enqueued_at: unix time of enqueue, used for latency stats
+    """
+    _celery().send_task(
+        SEND_VERIFICATION_CODE_TASK,
+        args=(email, auth_code),
+        kwargs={"enqueued_at": enqueued_at},
+    )
@@ -1,17 +1,32 @@
+import json
 import logging
-import random
-import smtplib
+import time
 from email.mime.text import MIMEText
 
 import bcrypt
+from celery.signals import worker_process_shutdown
+from redis import Redis
 
 from src.core.celery_config import celery
 from src.core.config import load_config
 from src.core.redis_initializer import get_redis
+from src.modules.smtp_celery_sender.delivery_stats import record_delivery_latency
+from src.modules.smtp_celery_sender.producer import SEND_VERIFICATION_CODE_TASK
+from src.modules.smtp_celery_sender.smtp_pool import (
+    close_smtp_pool,
+    get_smtp_pool,
+    is_message_rejected,
+)
 
 logger = logging.getLogger(__name__)
 config = load_config()
 
+OUTBOX_KEY = "smtp:outbox"
+OUTBOX_FLUSH_KEY = "smtp:outbox:flush_scheduled"
+# emails failed for connect/auth reasons go back to outbox this many times
+OUTBOX_MAX_ATTEMPTS = 3
+OUTBOX_RETRY_DELAY_SECONDS = 30
+
 
 def get_password_hash(password: str) -> str:
     return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
@@ -23,59 +38,157 @@ def verify_password(password_to_check: str, password_hash: str) -> bool:
     )
 
 
-def create_verification_code() -> int:
-    """
-    simple verification code creator
-    :return:
-    """
-    return str(random.randint(100_000, 999_999))
+@worker_process_shutdown.connect
+def _close_smtp_connections(**kwargs) -> None:
+    close_smtp_pool()
 
 
-@celery.task
+@celery.task(name=SEND_VERIFICATION_CODE_TASK)
 def send_verification_code(
     email: str,
-) -> int:
+    auth_code: str,
+    enqueued_at: float | None = None,
+) -> None:
     """
-    creating code, save it to redis, call smtp sender function
+    delivery only: code is created and saved to redis by api before enqueue,
+    sends it by smtp (or puts it to batch outbox when SMTP_BATCH_ENABLED)
     :param email: validated user email
-    :return: verification code
+    :param auth_code: verification code
+    :param enqueued_at: unix time of enqueue, used for latency stats
     """
     redis = get_redis()
-    code_to_user = create_verification_code()
     # imitate sms
     try:
-        redis.setex(
-            name=email,
-            time=config.verification_code_time_expiration,
-            value=code_to_user,
-        )
-        send_verification_code_by_smtp(email=email, auth_code=code_to_user)
-        logger.info(f"Successfully sent verification code {code_to_user} to {email}")
-        return code_to_user
+        if config.smtp.SMTP_BATCH_ENABLED:
+            _add_to_outbox(
+                redis, email=email, auth_code=auth_code, enqueued_at=enqueued_at
+            )
+            return
+        if send_verification_code_by_smtp(email=email, auth_code=auth_code):
+            logger.info(f"Successfully sent verification code to {email}")
+            if enqueued_at is not None:
+                record_delivery_latency(redis, [time.time() - enqueued_at])
     except Exception:
         logger.exception("Failed to send verification code")
 
 
-def send_verification_code_by_smtp(email: str, auth_code: int) -> None:
+def _add_to_outbox(
+    redis: Redis, email: str, auth_code: str, enqueued_at: float | None
+) -> None:
     """
-    отправляет код по email
+    queue code email for flush_verification_codes, flush is scheduled
+    after SMTP_BATCH_WINDOW_MS or at once when outbox reaches batch size
+    """
+    job = {"email": email, "code": auth_code, "enqueued_at": enqueued_at}
+    with redis.pipeline(transaction=False) as pipe:
+        pipe.rpush(OUTBOX_KEY, json.dumps(job))
+        # expiry only guards against a flush task lost by the broker
+        pipe.set(OUTBOX_FLUSH_KEY, 1, nx=True, ex=60)
+        outbox_size, flush_not_scheduled = pipe.execute()
+    if outbox_size >= config.smtp.SMTP_BATCH_MAX_SIZE:
+        flush_verification_codes.delay()
+    elif flush_not_scheduled:
+        flush_verification_codes.apply_async(
+            countdown=config.smtp.SMTP_BATCH_WINDOW_MS / 1000
+        )
 
-    :param auth_code: 6-digits code
-    :param email: user validated email
-    :return:
+
+@celery.task
+def flush_verification_codes() -> int:
+    """
+    send queued code emails in batches, one smtp session per batch,
+    each email is its own message and its failure doesn't affect others
+    :return: number of sent emails
+    """
+    redis = get_redis()
+    # emails queued from now on schedule the next flush
+    redis.delete(OUTBOX_FLUSH_KEY)
+    sent = 0
+    while items := redis.lpop(OUTBOX_KEY, config.smtp.SMTP_BATCH_MAX_SIZE):
+        jobs = [json.loads(item) for item in items]
+        try:
+            errors = get_smtp_pool(config.smtp).send_many(
+                [
+                    (
+                        config.smtp.SMTP_USER,
+                        job["email"],
+                        _build_message(job["email"], job["code"]),
+                    )
+                    for job in jobs
+                ]
+            )
+        except Exception as e:
+            # batch is already popped, don't lose it
+            _retry_later(redis, jobs, [e] * len(jobs))
+            raise
+        now = time.time()
+        latencies = []
+        failed_jobs, failed_errors = [], []
+        for job, error in zip(jobs, errors, strict=True):
+            if error is None:
+                sent += 1
+                if job.get("enqueued_at") is not None:
+                    latencies.append(now - job["enqueued_at"])
+            else:
+                failed_jobs.append(job)
+                failed_errors.append(error)
+        record_delivery_latency(redis, latencies)
+        if failed_jobs and _retry_later(redis, failed_jobs, failed_errors):
+            # requeued jobs are sent by the delayed flush, not by this loop
+            break
+        if len(items) < config.smtp.SMTP_BATCH_MAX_SIZE:
+            break
+    logger.info(f"Sent {sent} verification codes in batch")
+    return sent
+
+
+def _retry_later(redis: Redis, jobs: list[dict], errors: list[Exception]) -> int:
+    """
+    put jobs failed for connect/auth/session reasons back to outbox
+    and schedule a delayed flush, rejected or retried too often are dropped
+    :return: number of requeued jobs
     """
+    retry = []
+    for job, error in zip(jobs, errors, strict=True):
+        attempts = job.get("attempts", 0) + 1
+        if is_message_rejected(error) or attempts >= OUTBOX_MAX_ATTEMPTS:
+            logger.error(f"Failed to send verification code to {job['email']}: {error}")
+        else:
+            logger.warning(
+                f"Will retry verification code to {job['email']} "
+                f"(attempt {attempts}): {error}"
+            )
+            retry.append(json.dumps({**job, "attempts": attempts}))
+    if retry:
+        redis.rpush(OUTBOX_KEY, *retry)
+        flush_verification_codes.apply_async(countdown=OUTBOX_RETRY_DELAY_SECONDS)
+    return len(retry)
+
+
+def _build_message(email: str, auth_code: str) -> str:
     # Создаем email-сообщение
     msg = MIMEText(f"Ваш код подтверждения: {auth_code}")
     msg["Subject"] = "Код подтверждения"
     msg["From"] = config.smtp.SMTP_USER
     msg["To"] = email
+    return msg.as_string()
+
+
+def send_verification_code_by_smtp(email: str, auth_code: str) -> bool:
+    """
+    отправляет код по email
+
+    :param auth_code: 6-digits code
+    :param email: user validated email
+    :return: True if email was sent
+    """
+    msg = _build_message(email, auth_code)
     logger.info("Я начал отправку по email!")
     # Отправляем email
     try:
-        with smtplib.SMTP(config.smtp.SMTP_SERVER, config.smtp.SMTP_PORT) as server:
-            server.starttls()
-            server.login(config.smtp.SMTP_USER, config.smtp.SMTP_PASSWORD)
-            server.sendmail(config.smtp.SMTP_USER, email, msg.as_string())
+        get_smtp_pool(config.smtp).sendmail(config.smtp.SMTP_USER, email, msg)
         logger.info("Отправил код по email")
+        return True
     except Exception:
         logger.exception("Error while sending verification code")
+        return False
@@ -0,0 +1,185 @@
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+
+from src.core.config import SMTPConfig
+from src.core.metrics import SMTP_SEND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def is_message_rejected(error: Exception) -> bool:
+    """
+    True if server refused the message itself, sending it again won't help,
+    other errors (connect, auth, dropped session) may pass on a later attempt
+    """
+    return isinstance(
+        error,
+        (
+            smtplib.SMTPRecipientsRefused,
+            smtplib.SMTPSenderRefused,
+            smtplib.SMTPDataError,
+        ),
+    )
+
+
+class SMTPConnectionPool:
+    """
+    keeps authenticated smtp sessions open between tasks of one worker process
+
+    idle sessions older than idle_timeout are closed, others are checked
+    with NOOP before reuse, broken sessions are replaced with new ones
+    """
+
+    def __init__(self, smtp: SMTPConfig):
+        self._smtp = smtp
+        self._idle: queue.LifoQueue[tuple[smtplib.SMTP, float]] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(smtp.SMTP_POOL_SIZE)
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(
+            self._smtp.SMTP_SERVER,
+            self._smtp.SMTP_PORT,
+            timeout=self._smtp.SMTP_TIMEOUT,
+        )
+        try:
+            if self._smtp.SMTP_STARTTLS:
+                server.starttls()
+            if self._smtp.SMTP_PASSWORD:
+                server.login(self._smtp.SMTP_USER, self._smtp.SMTP_PASSWORD)
+        except Exception:
+            self._close(server)
+            raise
+        logger.info("SMTP connection opened")
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _get_idle(self) -> smtplib.SMTP | None:
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if time.monotonic() - last_used > self._smtp.SMTP_POOL_IDLE_TIMEOUT:
+                self._close(server)
+            elif self._is_alive(server):
+                return server
+            else:
+                server.close()
+
+    def _release(self, server: smtplib.SMTP) -> None:
+        self._idle.put((server, time.monotonic()))
+
+    def send_many(
+        self, messages: list[tuple[str, str | list[str], str]]
+    ) -> list[Exception | None]:
+        """
+        send messages one by one over a single pooled session,
+        failure of one message never stops the others
+        :param messages: (from_addr, to_addrs, msg) tuples
+        :return: None or error for every message, in the same order
+        """
+        errors: list[Exception | None] = []
+        with self._slots:
+            server = None
+            # once a new session can't be opened the rest of batch fails with it
+            connect_error: Exception | None = None
+            for from_addr, to_addrs, msg in messages:
+                start = time.perf_counter()
+                # second attempt on a new session if the old one was dropped
+                for attempt in range(2):
+                    if connect_error is not None:
+                        errors.append(connect_error)
+                        break
+                    if server is None:
+                        try:
+                            server = self._get_idle() or self._connect()
+                        except Exception as e:
+                            if attempt:
+                                connect_error = e
+                            continue
+                    try:
+                        server.sendmail(from_addr, to_addrs, msg)
+                        errors.append(None)
+                        break
+                    except (
+                        smtplib.SMTPResponseException,
+                        smtplib.SMTPRecipientsRefused,
+                    ) as e:
+                        # server rejected this message, session itself is usable
+                        errors.append(e)
+                        try:
+                            server.rset()
+                        except Exception:
+                            server.close()
+                            server = None
+                        break
+                    except Exception as e:
+                        server.close()
+                        server = None
+                        if attempt:
+                            errors.append(e)
+                            break
+                else:
+                    # connect failed on both attempts
+                    errors.append(connect_error)
+                SMTP_SEND_SECONDS.labels("failed" if errors[-1] else "sent").observe(
+                    time.perf_counter() - start
+                )
+            if server is not None:
+                self._release(server)
+        return errors
+
+    def sendmail(self, from_addr: str, to_addrs: str | list[str], msg: str) -> None:
+        """
+        send one message over pooled session
+        :raise: smtp/socket error if message was not sent
+        """
+        if error := self.send_many([(from_addr, to_addrs, msg)])[0]:
+            raise error
+
+    def close(self) -> None:
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+
+_pool: SMTPConnectionPool | None = None
+_pool_pid: int | None = None
+
+
+def get_smtp_pool(smtp: SMTPConfig) -> SMTPConnectionPool:
+    """
+    pool of current process, sockets are never shared with forked children
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = SMTPConnectionPool(smtp)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def close_smtp_pool() -> None:
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
+    _pool = None
@@ -1,6 +1,10 @@
 from fastapi import APIRouter
 
+from src.modules.jwks.routes import router as jwks_router
+from src.modules.metrics.routes import router as metrics_router
 from src.modules.reg_module.routes import router as auth_router
 
 main_router = APIRouter()
 main_router.include_router(auth_router)
+main_router.include_router(jwks_router)
+main_router.include_router(metrics_router)
@@ -0,0 +1,36 @@
+import asyncio
+from collections import deque
+
+from src.core.config import load_config
+from src.services.user_services import UserService
+
+config = load_config()
+
+
+class GuestIdAllocator:
+    """
+    hands out user ids for guests from blocks reserved in users id sequence,
+    one db round trip per block_size guests and no INSERT at all,
+    the guest row is written later by quota flush (see UserService.set_requests_counts)
+    """
+
+    def __init__(self, block_size: int):
+        self._block_size = block_size
+        self._ids: deque[int] = deque()
+        self._lock = asyncio.Lock()
+
+    async def allocate(self) -> int:
+        """
+        :return: new unique user id
+        """
+        if not self._ids:
+            async with self._lock:
+                # other coroutine could refill while we waited
+                if not self._ids:
+                    self._ids.extend(
+                        await UserService.reserve_user_ids(self._block_size)
+                    )
+        return self._ids.popleft()
+
+
+guest_id_allocator = GuestIdAllocator(block_size=config.guest.id_block_size)
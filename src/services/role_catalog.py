@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable
+
+from src.core.pubsub import add_subscribe_listener, publish, subscribe
+from src.services.role_services import RoleService
+
+logger = logging.getLogger(__name__)
+
+ROLES_CHANGED_CHANNEL = "catalog:roles:changed"
+# roles the service issues tokens for, rows are seeded by migrations
+USER_ROLE = "user"
+GUEST_ROLE = "guest"
+
+
+@dataclass(frozen=True)
+class RoleEntry:
+    """
+    role row with its permissions, scope is the space separated
+    permission names put into access tokens
+    """
+
+    id: int
+    name: str
+    scope: str
+
+    @property
+    def scopes(self) -> list[str]:
+        return self.scope.split()
+
+
+class RoleCatalog:
+    """
+    in-process copy of roles and permissions tables, so role ids and token
+    scopes are resolved without db lookups
+
+    loaded once at startup, every process reloads it when a message is
+    published to ROLES_CHANGED_CHANNEL (see notify_changed) and after each
+    pub/sub (re)subscribe, so changes sent while disconnected are not missed
+    """
+
+    def __init__(self):
+        # (entries by id, entries by name, name -> id, id -> name)
+        # swapped as one object on reload
+        self._state: tuple[dict, dict, dict, dict] = ({}, {}, {}, {})
+        self._reload_listeners: list[Callable[[], None]] = []
+        self._reload_task: asyncio.Task | None = None
+        self._reload_pending = False
+
+    def replace(self, roles: dict[int, tuple[str, list[str]]]) -> None:
+        """
+        :param roles: role id -> (role name, permission names)
+        """
+        by_id = {
+            role_id: RoleEntry(id=role_id, name=name, scope=" ".join(scopes))
+            for role_id, (name, scopes) in roles.items()
+        }
+        self._state = (
+            by_id,
+            {entry.name: entry for entry in by_id.values()},
+            {entry.name: role_id for role_id, entry in by_id.items()},
+            {role_id: entry.name for role_id, entry in by_id.items()},
+        )
+        logger.info(f"Role catalog loaded: {sorted(self._state[1])}")
+        for listener in self._reload_listeners:
+            listener()
+
+    async def load(self) -> None:
+        """
+        read catalog from db
+        """
+        self.replace(await RoleService.get_roles_with_scopes())
+
+    def add_reload_listener(self, listener: Callable[[], None]) -> None:
+        """
+        listener is called after every reload (e.g. to drop caches)
+        """
+        self._reload_listeners.append(listener)
+
+    def by_name(self, name: str) -> RoleEntry:
+        """
+        :raise: KeyError if role is unknown or catalog is not loaded
+        """
+        try:
+            return self._state[1][name]
+        except KeyError:
+            raise KeyError(f"Unknown role {name!r}") from None
+
+    def by_id(self, role_id: int) -> RoleEntry:
+        """
+        :raise: KeyError if role is unknown or catalog is not loaded
+        """
+        try:
+            return self._state[0][role_id]
+        except KeyError:
+            raise KeyError(f"Unknown role id {role_id!r}") from None
+
+    async def get_by_id(self, role_id: int) -> RoleEntry:
+        """
+        by_id that reloads catalog once on a miss (role added after the last
+        reload), concurrent misses wait for one shared reload
+        :raise: KeyError if role is still unknown after reload
+        """
+        try:
+            return self.by_id(role_id)
+        except KeyError:
+            self.schedule_reload()
+            await asyncio.shield(self._reload_task)
+        return self.by_id(role_id)
+
+    @property
+    def role_ids(self) -> dict[str, int]:
+        return self._state[2]
+
+    @property
+    def role_names(self) -> dict[int, str]:
+        return self._state[3]
+
+    def schedule_reload(self) -> None:
+        """
+        reload in background (pub/sub handlers must not block),
+        changes published during a reload are picked up by one more reload
+        """
+        self._reload_pending = True
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self._reload())
+
+    async def _reload(self) -> None:
+        while self._reload_pending:
+            self._reload_pending = False
+            try:
+                await self.load()
+            except Exception:
+                logger.exception("Role catalog reload failed, keeping previous")
+
+
+async def notify_changed() -> None:
+    """
+    call after roles, permissions or role_permissions rows are changed
+    """
+    await publish(ROLES_CHANGED_CHANNEL, "")
+
+
+role_catalog = RoleCatalog()
+subscribe(ROLES_CHANGED_CHANNEL, lambda _: role_catalog.schedule_reload())
+add_subscribe_listener(role_catalog.schedule_reload)
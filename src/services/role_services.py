@@ -0,0 +1,29 @@
+from sqlalchemy import select
+
+from src.core.metrics import DB_QUERY_SECONDS, timed
+from src.database import async_read_session
+from src.database.models import Permission, Role, role_permissions
+
+
+class RoleService:
+    @staticmethod
+    @timed(DB_QUERY_SECONDS, query="select_roles_with_scopes")
+    async def get_roles_with_scopes() -> dict[int, tuple[str, list[str]]]:
+        """
+        whole roles catalog in one query
+        :return: role id -> (role name, sorted permission names)
+        """
+        req = (
+            select(Role.id, Role.name, Permission.name)
+            .outerjoin(role_permissions, role_permissions.c.role_id == Role.id)
+            .outerjoin(Permission, Permission.id == role_permissions.c.permission_id)
+            .order_by(Role.id, Permission.name)
+        )
+        roles: dict[int, tuple[str, list[str]]] = {}
+        async with async_read_session() as session:
+            rows = await session.execute(req)
+            for role_id, role_name, scope in rows:
+                _, scopes = roles.setdefault(role_id, (role_name, []))
+                if scope is not None:
+                    scopes.append(scope)
+        return roles
@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from src.core.config import load_config
+from src.core.metrics import USER_CACHE_LOCAL_ENTRIES, USER_CACHE_LOOKUPS
+from src.core.pubsub import publish, subscribe
+from src.core.redis_initializer import get_async_redis
+
+config = load_config()
+
+USER_KEY = "cache:user:{user_id}"
+INVALIDATE_CHANNEL = "cache:user:invalidate"
+
+_LOCAL_HITS = USER_CACHE_LOOKUPS.labels("local")
+_REDIS_HITS = USER_CACHE_LOOKUPS.labels("redis")
+_MISSES = USER_CACHE_LOOKUPS.labels("miss")
+
+
+class UserCache:
+    """
+    two-tier read-through cache for user rows: in-process LRU, then redis
+
+    stores plain dicts of user columns, invalidate() drops the row from
+    redis and from local caches of every process (via pub/sub).
+    hits per tier, misses and local size are exported to /metrics
+    (auth_user_cache_*) to size local_size and ttls
+    """
+
+    def __init__(self, local_size: int, local_ttl: float, redis_ttl: int):
+        self._local_size = local_size
+        self._local_ttl = local_ttl
+        self._redis_ttl = redis_ttl
+        self._local: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return USER_KEY.format(user_id=user_id)
+
+    def _get_local(self, user_id: int) -> dict | None:
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._local[user_id]
+                USER_CACHE_LOCAL_ENTRIES.set(len(self._local))
+                return None
+            self._local.move_to_end(user_id)
+            return entry[1]
+
+    def _set_local(self, user_id: int, data: dict) -> None:
+        with self._lock:
+            self._local[user_id] = (time.monotonic() + self._local_ttl, data)
+            self._local.move_to_end(user_id)
+            while len(self._local) > self._local_size:
+                self._local.popitem(last=False)
+            USER_CACHE_LOCAL_ENTRIES.set(len(self._local))
+
+    def drop_local(self, user_id: int) -> None:
+        with self._lock:
+            if self._local.pop(user_id, None) is not None:
+                USER_CACHE_LOCAL_ENTRIES.set(len(self._local))
+
+    async def get(self, user_id: int) -> dict | None:
+        """
+        :param user_id: user id
+        :return: cached user columns or None on miss
+        """
+        if (data := self._get_local(user_id)) is not None:
+            _LOCAL_HITS.inc()
+            return data
+        raw = await get_async_redis().get(self._key(user_id))
+        if raw is None:
+            _MISSES.inc()
+            return None
+        _REDIS_HITS.inc()
+        data = json.loads(raw)
+        self._set_local(user_id, data)
+        return data
+
+    async def set(self, user_id: int, data: dict) -> None:
+        self._set_local(user_id, data)
+        await get_async_redis().set(
+            self._key(user_id), json.dumps(data), ex=self._redis_ttl
+        )
+
+    async def invalidate(self, user_id: int) -> None:
+        """
+        call after user row is changed
+        """
+        await self.invalidate_many([user_id])
+
+    async def invalidate_many(self, user_ids: list[int]) -> None:
+        """
+        invalidate() for many rows with one DEL and one message
+        """
+        if not user_ids:
+            return
+        for user_id in user_ids:
+            self.drop_local(user_id)
+        await get_async_redis().delete(*(self._key(user_id) for user_id in user_ids))
+        await publish(INVALIDATE_CHANNEL, ",".join(map(str, user_ids)))
+
+
+user_cache = UserCache(
+    local_size=config.user_cache.local_size,
+    local_ttl=config.user_cache.local_ttl_seconds,
+    redis_ttl=config.user_cache.redis_ttl_seconds,
+)
+
+
+def _on_invalidate(data: str) -> None:
+    # comma separated ids, see invalidate_many
+    for user_id in data.split(","):
+        user_cache.drop_local(int(user_id))
+
+
+subscribe(INVALIDATE_CHANNEL, _on_invalidate)
@@ -1,11 +1,19 @@
-from sqlalchemy import insert, select
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from src.database import async_session
+from src.core.metrics import DB_QUERY_SECONDS, timed
+from src.database import async_read_session, async_session, engine, read_engine
 from src.database.models import User
+from src.services.role_catalog import GUEST_ROLE, role_catalog
+from src.services.user_cache import user_cache
+
+# columns kept in user cache, requests_count lives in quota store
+CACHED_USER_COLUMNS = ("id", "email", "role_id")
 
 
 class UserService:
     @staticmethod
+    @timed(DB_QUERY_SECONDS, query="create_user")
     async def create_user(email, role_id) -> User:
         create_user_req = (
             insert(User).values(email=email, role_id=role_id).returning(User)
@@ -15,15 +23,111 @@ class UserService:
             return created_user_chunked.scalar()
 
     @staticmethod
-    async def get_user_by_id(id: int) -> User:
-        async with async_session() as session:
-            req = select(User).where(User.id == id)
+    @timed(DB_QUERY_SECONDS, query="upsert_user_by_email")
+    async def upsert_user_by_email(email: str, role_id: int) -> User:
+        """
+        one round trip login write: insert user or return existing row
+        of this email (relies on unique ix_users_email)
+        :param email: user email, lowercased (schemas.LoginEmail)
+        :param role_id: role of a new row, existing rows keep their role
+        :return: new or existing user
+        """
+        req = pg_insert(User).values(email=email, role_id=role_id)
+        # no-op update, DO NOTHING would return no row on conflict
+        req = req.on_conflict_do_update(
+            index_elements=[User.email], set_={"email": req.excluded.email}
+        ).returning(User)
+        async with async_session() as session, session.begin():
             user_chunked = await session.execute(req)
             return user_chunked.scalar()
 
     @staticmethod
+    async def get_user_by_id(id: int) -> User:
+        """
+        read-through user_cache, returned model is detached and has
+        only CACHED_USER_COLUMNS filled when served from cache
+        """
+        if (cached := await user_cache.get(id)) is not None:
+            return User(**cached)
+        user = await UserService._select_user_by_id(id)
+        if user is not None:
+            await user_cache.set(
+                id, {column: getattr(user, column) for column in CACHED_USER_COLUMNS}
+            )
+        return user
+
+    @staticmethod
+    async def invalidate_user(id: int) -> None:
+        """
+        must be called by every code path that changes cached user columns
+        """
+        await user_cache.invalidate(id)
+
+    @staticmethod
+    async def invalidate_users(ids: list[int]) -> None:
+        """
+        invalidate_user for many users, e.g. rows deleted by migrations
+        """
+        await user_cache.invalidate_many(ids)
+
+    @staticmethod
+    @timed(DB_QUERY_SECONDS, query="select_user_by_id")
+    async def _select_user_by_id(id: int) -> User:
+        req = select(User).where(User.id == id)
+        async with async_read_session() as session:
+            user_chunked = await session.execute(req)
+            user = user_chunked.scalar()
+        if user is None and read_engine is not engine:
+            # user may be just created and not replicated yet
+            async with async_session() as session:
+                user_chunked = await session.execute(req)
+                user = user_chunked.scalar()
+        return user
+
+    @staticmethod
+    @timed(DB_QUERY_SECONDS, query="get_user_reqs_count")
     async def get_user_reqs_count(user_id: int) -> int:
-        async with async_session() as session:
+        async with async_read_session() as session:
             req = select(User.requests_count).where(User.id == user_id)
             reqs_chunked = await session.execute(req)
             return reqs_chunked.scalar()
+
+    @staticmethod
+    @timed(DB_QUERY_SECONDS, query="reserve_user_ids")
+    async def reserve_user_ids(count: int) -> list[int]:
+        """
+        take count ids from users id sequence in one round trip,
+        used to issue guest ids without inserting rows
+        :param count: ids to reserve
+        :return: reserved ids
+        """
+        req = select(
+            func.nextval(func.pg_get_serial_sequence(User.__tablename__, "id"))
+        ).select_from(func.generate_series(1, count))
+        async with async_session() as session:
+            ids_chunked = await session.execute(req)
+            return list(ids_chunked.scalars())
+
+    @staticmethod
+    @timed(DB_QUERY_SECONDS, query="set_requests_counts")
+    async def set_requests_counts(counts: dict[int, int]) -> None:
+        """
+        bulk update users.requests_count in one statement,
+        missing rows (lazy guests) are inserted with guest role
+        :param counts: user id -> requests count
+        """
+        if not counts:
+            return
+        guest_role_id = role_catalog.by_name(GUEST_ROLE).id
+        req = pg_insert(User).values(
+            [
+                {"id": user_id, "role_id": guest_role_id, "requests_count": count}
+                for user_id, count in counts.items()
+            ]
+        )
+        req = req.on_conflict_do_update(
+            index_elements=[User.id],
+            set_={"requests_count": req.excluded.requests_count},
+        )
+        async with async_session() as session, session.begin():
+            await session.execute(req)
@@ -0,0 +1,111 @@
+"""
+/auth/auth when verification email can't be enqueued, login email form
+
+run from project root (no services needed):
+    python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+PLACEHOLDER_ENV = {
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_USERNAME": "test",
+    "DATABASE_PASSWORD": "test",
+    "DATABASE_NAME": "test",
+    "SMTP_SERVER": "localhost",
+    "SMTP_PORT": "25",
+    "SMTP_USER": "test@example.com",
+    "SMTP_PASSWORD": "",
+    "VERIFICATION_CODE_SECRET": "test",
+}
+
+
+def setUpModule():
+    # settings are read on first import of src, keys are loaded on import too
+    global keys_dir
+    keys_dir = tempfile.TemporaryDirectory()
+    Path(keys_dir.name, "test-private.pem").write_bytes(
+        ed25519.Ed25519PrivateKey.generate().private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    os.environ.setdefault("JWT_KEYS_DIR", keys_dir.name)
+    os.environ.setdefault("JWT_ACTIVE_KID", "test")
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+
+
+def tearDownModule():
+    keys_dir.cleanup()
+
+
+class EnqueueFailureTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        from src.modules.reg_module import routes, schemas
+
+        self.routes = routes
+        self.form = schemas.EmailForm(email="user@example.com")
+        self.redis = mock.AsyncMock()
+        patches = [
+            mock.patch.object(routes.auth_email_limiter, "check"),
+            mock.patch.object(
+                routes, "create_verification_code", return_value="123456"
+            ),
+            mock.patch.object(routes.code_store, "save", return_value=0),
+            mock.patch.object(routes.code_store, "discard", return_value=True),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_code_is_discarded_when_enqueue_fails(self):
+        from fastapi import HTTPException
+
+        with (
+            mock.patch.object(
+                self.routes,
+                "enqueue_verification_code",
+                side_effect=ConnectionError("broker is down"),
+            ),
+            self.assertLogs(level="ERROR"),
+            self.assertRaises(HTTPException) as raised,
+        ):
+            await self.routes.auth_user(self.form, redis_client=self.redis)
+        self.assertEqual(raised.exception.status_code, 500)
+        self.routes.code_store.discard.assert_awaited_once_with(
+            self.redis, email="user@example.com", code="123456"
+        )
+
+    async def test_code_is_kept_when_enqueued(self):
+        with mock.patch.object(self.routes, "enqueue_verification_code"):
+            result = await self.routes.auth_user(self.form, redis_client=self.redis)
+        self.assertEqual(result.message, "Verification code sent successfully")
+        self.routes.code_store.discard.assert_not_awaited()
+
+
+class LoginEmailTest(unittest.TestCase):
+    def test_login_forms_lowercase_email(self):
+        from src.modules.reg_module import schemas
+
+        # code request and code check must hit the same users row
+        self.assertEqual(
+            schemas.EmailForm(email="Foo@Example.COM").email, "foo@example.com"
+        )
+        self.assertEqual(
+            schemas.UserAuthInfo(code="1", email="FOO@example.com").email,
+            "foo@example.com",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
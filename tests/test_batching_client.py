@@ -0,0 +1,67 @@
+"""
+batching CheckToken client when a batch call goes wrong
+
+run from project root (no services needed):
+    python -m unittest discover tests
+"""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from src.modules.grpc_token_validator import auth_service_pb2
+
+
+class BatchFailureTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from src.modules.grpc_token_validator.client import BatchingTokenClient
+
+        self.client = BatchingTokenClient("127.0.0.1:1", max_delay=0.001)
+        self.client._stub = mock.Mock()
+        self.addAsyncCleanup(self.client.close)
+
+    async def check_all(self, *tokens):
+        return await asyncio.wait_for(
+            asyncio.gather(
+                *(self.client.check(token) for token in tokens),
+                return_exceptions=True,
+            ),
+            timeout=1,
+        )
+
+    async def test_results_are_matched_by_position(self):
+        self.client._stub.CheckTokens = mock.AsyncMock(
+            return_value=auth_service_pb2.TokensResponse(
+                results=[
+                    auth_service_pb2.TokenResponse(valid=True),
+                    auth_service_pb2.TokenResponse(valid=False, error="Invalid"),
+                ]
+            )
+        )
+        first, second = await self.check_all("a", "b")
+        self.assertTrue(first.valid)
+        self.assertEqual(second.error, "Invalid")
+
+    async def test_wrong_result_count_fails_every_caller(self):
+        self.client._stub.CheckTokens = mock.AsyncMock(
+            return_value=auth_service_pb2.TokensResponse(
+                results=[auth_service_pb2.TokenResponse(valid=True)]
+            )
+        )
+        with self.assertLogs(level="ERROR"):
+            results = await self.check_all("a", "b")
+        for result in results:
+            self.assertIsInstance(result, Exception)
+            self.assertIn("1 results for 2 tokens", str(result))
+
+    async def test_rpc_error_fails_every_caller(self):
+        self.client._stub.CheckTokens = mock.AsyncMock(
+            side_effect=ConnectionError("unavailable")
+        )
+        with self.assertLogs(level="ERROR"):
+            results = await self.check_all("a", "b")
+        self.assertTrue(all(isinstance(r, ConnectionError) for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
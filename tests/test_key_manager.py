@@ -0,0 +1,61 @@
+"""
+jwt key manager rotation
+
+run from project root (no services needed):
+    python -m unittest discover tests
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+
+def write_private_key(keys_dir: Path, kid: str, private_key) -> None:
+    Path(keys_dir, f"{kid}-private.pem").write_bytes(
+        private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+
+
+class KeyRotationTest(unittest.TestCase):
+    def setUp(self):
+        from src.modules.reg_module.jwt_module.key_manager import KeyManager
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.keys_dir = Path(tmp.name)
+        self.rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        write_private_key(self.keys_dir, "jwt", self.rsa_key)
+        self.manager = KeyManager(keys_dir=self.keys_dir, active_kid="jwt")
+
+    def rotate_to_ed25519(self):
+        write_private_key(self.keys_dir, "ed1", ed25519.Ed25519PrivateKey.generate())
+        Path(self.keys_dir, "active_kid").write_text("ed1\n")
+        self.manager.reload()
+        self.assertEqual(self.manager.active_key.kid, "ed1")
+
+    def test_kid_less_token_verifies_after_rotation(self):
+        # tokens issued before keys had ids carry no kid header
+        token = jwt.encode({"sub": "1"}, self.rsa_key, algorithm="RS256")
+        self.assertEqual(self.manager.verify(token), {"sub": "1"})
+        self.rotate_to_ed25519()
+        self.assertEqual(self.manager.verify(token), {"sub": "1"})
+
+    def test_new_tokens_use_active_kid(self):
+        old_token = self.manager.sign({"sub": "1"})
+        self.rotate_to_ed25519()
+        new_token = self.manager.sign({"sub": "2"})
+        self.assertEqual(jwt.get_unverified_header(new_token)["kid"], "ed1")
+        self.assertEqual(self.manager.verify(old_token), {"sub": "1"})
+        self.assertEqual(self.manager.verify(new_token), {"sub": "2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
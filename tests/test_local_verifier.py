@@ -0,0 +1,100 @@
+"""
+local token verifier when auth service jwks becomes unreachable
+
+run from project root (no services needed):
+    python -m unittest discover tests
+"""
+
+import http.server
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+
+class JWKSServer(http.server.ThreadingHTTPServer):
+    def __init__(self, jwks: dict):
+        super().__init__(("127.0.0.1", 0), JWKSHandler)
+        self.jwks = jwks
+        self.requests = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/.well-known/jwks.json"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class JWKSHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        body = json.dumps(self.server.jwks).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class JWKSOutageTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        from src.modules.grpc_token_validator.local_verifier import (
+            LocalTokenVerifier,
+        )
+
+        self.private_key = ed25519.Ed25519PrivateKey.generate()
+        jwk = jwt.get_algorithm_by_name("EdDSA").to_jwk(
+            self.private_key.public_key(), as_dict=True
+        )
+        self.server = JWKSServer({"keys": [{**jwk, "kid": "ed1", "alg": "EdDSA"}]})
+        self.addCleanup(self.server.stop)
+        self.verifier = LocalTokenVerifier(
+            self.server.url, cache_seconds=60, min_refresh_interval=30, timeout=1
+        )
+
+    def token(self, kid: str = "ed1") -> str:
+        return jwt.encode(
+            {"sub": "1", "role": "user", "token_type": "access_token"},
+            self.private_key,
+            algorithm="EdDSA",
+            headers={"kid": kid},
+        )
+
+    def expire_cache(self):
+        self.verifier._expires_at = time.monotonic() - 1
+        self.verifier._fetched_at = time.monotonic() - 60
+
+    async def test_cached_keys_are_used_while_jwks_is_down(self):
+        self.assertTrue((await self.verifier.check(self.token())).valid)
+        self.expire_cache()
+        down = mock.patch(
+            "urllib.request.urlopen", side_effect=OSError("connection refused")
+        )
+        with down as urlopen, self.assertLogs(level="ERROR"):
+            response = await self.verifier.check(self.token())
+            self.assertTrue(response.valid)
+            # next attempt waits for min_refresh_interval
+            self.assertTrue((await self.verifier.check(self.token())).valid)
+            self.assertEqual(urlopen.call_count, 1)
+
+    async def test_unknown_kid_fails_while_jwks_is_down(self):
+        with (
+            mock.patch("urllib.request.urlopen", side_effect=OSError("down")),
+            self.assertLogs(level="ERROR"),
+        ):
+            response = await self.verifier.check(self.token())
+        self.assertFalse(response.valid)
+        self.assertIn("Unknown key id", response.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+guest quota consume with non-positive amounts
+
+run from project root (no services needed):
+    python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+PLACEHOLDER_ENV = {
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_USERNAME": "test",
+    "DATABASE_PASSWORD": "test",
+    "DATABASE_NAME": "test",
+    "SMTP_SERVER": "localhost",
+    "SMTP_PORT": "25",
+    "SMTP_USER": "test@example.com",
+    "SMTP_PASSWORD": "",
+    "VERIFICATION_CODE_SECRET": "test",
+}
+
+
+def setUpModule():
+    # settings are read on first import of src, keys are loaded on import too
+    global keys_dir
+    keys_dir = tempfile.TemporaryDirectory()
+    Path(keys_dir.name, "test-private.pem").write_bytes(
+        ed25519.Ed25519PrivateKey.generate().private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    os.environ.setdefault("JWT_KEYS_DIR", keys_dir.name)
+    os.environ.setdefault("JWT_ACTIVE_KID", "test")
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+
+
+def tearDownModule():
+    keys_dir.cleanup()
+
+
+class NegativeAmountTest(unittest.IsolatedAsyncioTestCase):
+    async def test_grpc_rejects_negative_amount(self):
+        from src.modules.grpc_token_validator import auth_service_pb2
+        from src.modules.grpc_token_validator.grpc_token_validator import (
+            AuthServiceServicer,
+        )
+        from src.modules.quota.quota_store import quota_store
+
+        with mock.patch.object(quota_store, "consume") as consume:
+            response = await AuthServiceServicer().ConsumeQuota(
+                auth_service_pb2.QuotaRequest(token="any", amount=-5), None
+            )
+        self.assertFalse(response.allowed)
+        self.assertEqual(response.error, "Amount must not be negative")
+        consume.assert_not_called()
+
+    async def test_store_rejects_non_positive_amount(self):
+        from src.modules.quota.quota_store import quota_store
+
+        for amount in (0, -1):
+            with self.assertRaises(ValueError):
+                await quota_store.consume(user_id=1, amount=amount)
+
+    async def test_script_rejects_non_positive_amount(self):
+        try:
+            import fakeredis
+        except ImportError:
+            self.skipTest("fakeredis is not installed")
+        from redis.exceptions import ResponseError
+
+        from src.modules.quota.quota_store import CONSUME_SCRIPT, DIRTY_KEY
+
+        redis_client = fakeredis.FakeAsyncRedis()
+        await redis_client.set("quota:used:1", 3)
+        script = redis_client.register_script(CONSUME_SCRIPT)
+        with self.assertRaises(ResponseError):
+            await script(keys=["quota:used:1", DIRTY_KEY], args=[-2, 10, 1, 60])
+        self.assertEqual(int(await redis_client.get("quota:used:1")), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
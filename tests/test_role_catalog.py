@@ -0,0 +1,106 @@
+"""
+role lookups of login and refresh when user row points at a role
+missing in the in-process catalog
+
+run from project root (no services needed):
+    python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+PLACEHOLDER_ENV = {
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_USERNAME": "test",
+    "DATABASE_PASSWORD": "test",
+    "DATABASE_NAME": "test",
+    "SMTP_SERVER": "localhost",
+    "SMTP_PORT": "25",
+    "SMTP_USER": "test@example.com",
+    "SMTP_PASSWORD": "",
+    "VERIFICATION_CODE_SECRET": "test",
+}
+
+
+def setUpModule():
+    # settings are read on first import of src, keys are loaded on import too
+    global keys_dir
+    keys_dir = tempfile.TemporaryDirectory()
+    Path(keys_dir.name, "test-private.pem").write_bytes(
+        ed25519.Ed25519PrivateKey.generate().private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    os.environ["JWT_KEYS_DIR"] = keys_dir.name
+    os.environ["JWT_ACTIVE_KID"] = "test"
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+
+
+def tearDownModule():
+    keys_dir.cleanup()
+
+
+class RoleCatalogMissTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        from src.services.role_catalog import RoleCatalog
+
+        self.catalog = RoleCatalog()
+        self.catalog.replace({1: ("user", ["profile:read"]), 2: ("guest", [])})
+        self.roles_in_db = {
+            1: ("user", ["profile:read"]),
+            2: ("guest", []),
+            3: ("admin", ["admin"]),
+        }
+        self.loads = 0
+
+        async def get_roles_with_scopes():
+            self.loads += 1
+            return self.roles_in_db
+
+        patcher = mock.patch(
+            "src.services.role_catalog.RoleService.get_roles_with_scopes",
+            get_roles_with_scopes,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_known_role_does_not_reload(self):
+        entry = await self.catalog.get_by_id(1)
+        self.assertEqual(entry.name, "user")
+        self.assertEqual(self.loads, 0)
+
+    async def test_miss_reloads_once(self):
+        entry = await self.catalog.get_by_id(3)
+        self.assertEqual((entry.name, entry.scopes), ("admin", ["admin"]))
+        self.assertEqual(self.loads, 1)
+
+    async def test_unknown_after_reload_raises(self):
+        with self.assertRaises(KeyError):
+            await self.catalog.get_by_id(42)
+        self.assertEqual(self.loads, 1)
+
+    async def test_route_returns_503_for_unknown_role(self):
+        from fastapi import HTTPException
+
+        from src.database.models import User
+        from src.modules.reg_module import routes
+
+        with mock.patch.object(routes, "role_catalog", self.catalog):
+            self.assertEqual(await routes._role_name(User(id=7, role_id=3)), "admin")
+            with self.assertRaises(HTTPException) as raised:
+                await routes._role_name(User(id=7, role_id=42))
+        self.assertEqual(raised.exception.status_code, 503)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+smtp pool and batch flush against a local smtp sink
+
+run from project root (no services needed):
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import socketserver
+import threading
+import unittest
+from unittest import mock
+
+PLACEHOLDER_ENV = {
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_USERNAME": "test",
+    "DATABASE_PASSWORD": "test",
+    "DATABASE_NAME": "test",
+    "SMTP_SERVER": "localhost",
+    "SMTP_PORT": "25",
+    "SMTP_USER": "test@example.com",
+    "SMTP_PASSWORD": "",
+    "VERIFICATION_CODE_SECRET": "test",
+}
+
+
+def setUpModule():
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    minimal smtp server keeping received messages in memory,
+    greeting/auth reply and rejected recipients are configurable
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPSinkHandler)
+        self.greeting = "220 sink ready"
+        self.auth_reply = "235 ok"
+        self.rejected = set()
+        self.messages = []
+        self.connections = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        sink = self.server
+        sink.connections += 1
+        self.reply(sink.greeting)
+        if not sink.greeting.startswith("220"):
+            return
+        rcpt = None
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-sink")
+                self.reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                self.reply(sink.auth_reply)
+            elif verb == "MAIL":
+                self.reply("250 ok")
+            elif verb == "RCPT":
+                rcpt = command.split(":", 1)[1].strip("<> ")
+                if rcpt in sink.rejected:
+                    self.reply("550 no such user")
+                else:
+                    self.reply("250 ok")
+            elif verb == "DATA":
+                self.reply("354 go on")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                sink.messages.append(rcpt)
+                self.reply("250 queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 ok")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+class SMTPPoolTest(unittest.TestCase):
+    def setUp(self):
+        from src.core.config import SMTPConfig
+        from src.modules.smtp_celery_sender.smtp_pool import SMTPConnectionPool
+
+        self.sink = SMTPSink()
+        self.addCleanup(self.sink.stop)
+        self.smtp = SMTPConfig(
+            SMTP_SERVER="127.0.0.1",
+            SMTP_PORT=self.sink.port,
+            SMTP_USER="sender@example.com",
+            SMTP_PASSWORD="secret",
+            SMTP_STARTTLS=False,
+            SMTP_TIMEOUT=2,
+        )
+        self.pool = SMTPConnectionPool(self.smtp)
+        self.addCleanup(self.pool.close)
+
+    def batch(self, *emails):
+        return [
+            (self.smtp.SMTP_USER, email, "Subject: code\r\n\r\n1") for email in emails
+        ]
+
+    def test_batch_uses_one_session(self):
+        errors = self.pool.send_many(self.batch("a@x.com", "b@x.com", "c@x.com"))
+        self.assertEqual(errors, [None, None, None])
+        self.assertEqual(self.sink.messages, ["a@x.com", "b@x.com", "c@x.com"])
+        self.assertEqual(self.sink.connections, 1)
+
+    def test_rejected_recipient_does_not_stop_batch(self):
+        import smtplib
+
+        self.sink.rejected.add("b@x.com")
+        errors = self.pool.send_many(self.batch("a@x.com", "b@x.com", "c@x.com"))
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], smtplib.SMTPRecipientsRefused)
+        self.assertIsNone(errors[2])
+        self.assertEqual(self.sink.messages, ["a@x.com", "c@x.com"])
+
+    def test_auth_failure_is_reported_per_message(self):
+        import smtplib
+
+        self.sink.auth_reply = "535 bad credentials"
+        errors = self.pool.send_many(self.batch("a@x.com", "b@x.com"))
+        self.assertEqual(len(errors), 2)
+        for error in errors:
+            self.assertIsInstance(error, smtplib.SMTPAuthenticationError)
+        # one retry, not a reconnect for every message of the batch
+        self.assertEqual(self.sink.connections, 2)
+
+    def test_bad_greeting_is_reported_per_message(self):
+        import smtplib
+
+        self.sink.greeting = "554 go away"
+        errors = self.pool.send_many(self.batch("a@x.com"))
+        self.assertIsInstance(errors[0], smtplib.SMTPConnectError)
+
+    def test_flush_requeues_batch_on_auth_failure(self):
+        from src.modules.smtp_celery_sender import send_code_to_user as sender
+
+        self.sink.auth_reply = "535 bad credentials"
+        jobs = [
+            {"email": "a@x.com", "code": "111111", "enqueued_at": None},
+            {"email": "b@x.com", "code": "222222", "enqueued_at": None, "attempts": 2},
+        ]
+        redis = mock.MagicMock()
+        redis.lpop.side_effect = [[json.dumps(job) for job in jobs], None]
+        with (
+            mock.patch.object(sender, "get_redis", return_value=redis),
+            mock.patch.object(sender, "get_smtp_pool", return_value=self.pool),
+            mock.patch.object(sender.flush_verification_codes, "apply_async") as flush,
+        ):
+            self.assertEqual(sender.flush_verification_codes.run(), 0)
+        # second job has used up its attempts and is dropped
+        redis.rpush.assert_called_once_with(
+            sender.OUTBOX_KEY, json.dumps({**jobs[0], "attempts": 1})
+        )
+        flush.assert_called_once_with(countdown=sender.OUTBOX_RETRY_DELAY_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+verified token cache hit/miss and size exported to /metrics
+
+run from project root (no services needed):
+    python -m unittest discover tests
+"""
+
+import time
+import unittest
+
+import jwt
+from prometheus_client import REGISTRY
+
+
+def lookups(result: str) -> float:
+    return REGISTRY.get_sample_value(
+        "auth_token_cache_lookups_total", {"result": result}
+    )
+
+
+def decoder(token: str) -> dict:
+    if token == "garbage":
+        raise jwt.InvalidTokenError("Not enough segments")
+    return {"sub": token, "exp": time.time() + 60}
+
+
+class TokenCacheMetricsTest(unittest.TestCase):
+    def setUp(self):
+        from src.modules.reg_module.jwt_module.token_cache import TokenCache
+
+        self.cache = TokenCache(max_size=2, negative_ttl=10)
+
+    def test_hits_and_misses_are_counted(self):
+        hits, misses = lookups("hit"), lookups("miss")
+        self.cache.decode("a", decoder)
+        self.cache.decode("a", decoder)
+        for _ in range(2):
+            with self.assertRaises(jwt.InvalidTokenError):
+                self.cache.decode("garbage", decoder)
+        self.assertEqual(lookups("hit") - hits, 2)
+        self.assertEqual(lookups("miss") - misses, 2)
+
+    def test_size_is_exported(self):
+        for token in ("a", "b", "c"):
+            self.cache.decode(token, decoder)
+        self.assertEqual(REGISTRY.get_sample_value("auth_token_cache_entries"), 2)
+        self.cache.clear()
+        self.assertEqual(REGISTRY.get_sample_value("auth_token_cache_entries"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+user cache lookups exported to /metrics
+
+run from project root (no services needed):
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import unittest
+from unittest import mock
+
+from prometheus_client import REGISTRY
+
+PLACEHOLDER_ENV = {
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_USERNAME": "test",
+    "DATABASE_PASSWORD": "test",
+    "DATABASE_NAME": "test",
+    "SMTP_SERVER": "localhost",
+    "SMTP_PORT": "25",
+    "SMTP_USER": "test@example.com",
+    "SMTP_PASSWORD": "",
+    "VERIFICATION_CODE_SECRET": "test",
+}
+
+
+def setUpModule():
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+
+
+def lookups(result: str) -> float:
+    return REGISTRY.get_sample_value(
+        "auth_user_cache_lookups_total", {"result": result}
+    )
+
+
+class UserCacheMetricsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        from src.services import user_cache
+
+        self.cache = user_cache.UserCache(local_size=2, local_ttl=60, redis_ttl=60)
+        self.redis = mock.AsyncMock()
+        patcher = mock.patch.object(
+            user_cache, "get_async_redis", return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_lookups_are_counted_by_tier(self):
+        before = {result: lookups(result) for result in ("local", "redis", "miss")}
+        self.redis.get.return_value = None
+        self.assertIsNone(await self.cache.get(1))
+        self.redis.get.return_value = json.dumps({"id": 1})
+        self.assertEqual(await self.cache.get(1), {"id": 1})
+        self.assertEqual(await self.cache.get(1), {"id": 1})
+        for result in ("local", "redis", "miss"):
+            self.assertEqual(lookups(result) - before[result], 1, result)
+
+    async def test_local_size_is_exported(self):
+        for user_id in range(3):
+            await self.cache.set(user_id, {"id": user_id})
+        self.assertEqual(REGISTRY.get_sample_value("auth_user_cache_local_entries"), 2)
+        self.cache.drop_local(2)
+        self.assertEqual(REGISTRY.get_sample_value("auth_user_cache_local_entries"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()